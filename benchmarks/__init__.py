@@ -0,0 +1 @@
+"""Benchmarks that drive the rank logic against in-memory stand-ins for Discord objects."""
@@ -0,0 +1,158 @@
+"""
+Benchmarks RankManager operations on ladders of fake members.
+
+Usage:
+    python -m benchmarks.bench_rank_manager --sizes 10000 100000 1000000 --output results.json
+
+Each scenario reports wall time, CPU time, peak traced memory and the simulated
+Discord API calls it made, as JSON.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Awaitable, Callable, List
+
+import config
+from utils import storage
+from utils.rank_index import RankIndex
+from utils.rank_manager import RankManager
+
+from benchmarks.fakes import ApiCalls, FakeGuild
+
+# Share of members marked dirty in the reconcile scenario
+RECONCILE_SHARE = 0.01
+
+
+class Bench:
+    """Runs the scenarios of one ladder size and collects their results."""
+
+    def __init__(self, size: int, api: ApiCalls, trace_memory: bool):
+        self.size = size
+        self.api = api
+        self.trace_memory = trace_memory
+        self.results: List[dict] = []
+
+    async def measure(self, scenario: str, operation: Callable[[], Awaitable[None]]):
+        gc.collect()
+        self.api.reset()
+        if self.trace_memory:
+            tracemalloc.start()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        await operation()
+        cpu_time = time.process_time() - cpu_start
+        wall_time = time.perf_counter() - wall_start
+        peak_memory = None
+        if self.trace_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        result = {
+            'scenario': scenario,
+            'size': self.size,
+            'wall_s': round(wall_time, 6),
+            'cpu_s': round(cpu_time, 6),
+            'peak_memory_bytes': peak_memory,
+            'api_calls': dict(self.api.counts),
+        }
+        self.results.append(result)
+        print(
+            f"{scenario:>18} n={self.size:<8} wall={wall_time:.3f}s cpu={cpu_time:.3f}s "
+            f"calls={sum(self.api.counts.values())}",
+            file=sys.stderr
+        )
+
+
+def seed_ladder(manager: RankManager, guild: FakeGuild, ranks: dict):
+    """Gives every member in `ranks` that rank and a matching nickname, without API calls."""
+    state = manager.get_state(guild.id)
+    state.user_ranks = RankIndex(ranks)
+    for member in guild.members:
+        rank = ranks.get(str(member.id))
+        member.nick = f"{member.name} #{rank}" if rank is not None else None
+    manager.mark_dirty(state)
+
+
+async def run_size(size: int, latency: float, trace_memory: bool) -> List[dict]:
+    api = ApiCalls(latency)
+    guild = FakeGuild(1, size, api)
+    manager = RankManager()
+
+    # Renders are measured on their own, not as a side effect of the commands
+    async def skip_render(guild):
+        pass
+    manager.renderer.render = skip_render
+
+    bench = Bench(size, api, trace_memory)
+    seed_ladder(manager, guild, {str(member_id): member_id for member_id in range(1, size + 1)})
+    await manager.flush()
+    state = manager.get_state(guild.id)
+
+    def member_at(rank: int) -> int:
+        return int(next(state.user_ranks.slice(rank - 1, rank))[0])
+
+    await bench.measure('render_initial', lambda: manager.update_rank_message(guild))
+    await bench.measure('render_unchanged', lambda: manager.update_rank_message(guild))
+    await bench.measure('enforce_consistent', lambda: manager.enforce_ranks_on_discord(guild, guild.members))
+
+    middle = size // 2
+    await bench.measure('set_local', lambda: manager.adjust_ranks(guild, member_at(middle), middle, middle - 1))
+    await bench.measure('set_to_top', lambda: manager.adjust_ranks(guild, member_at(size), size, 1))
+    await bench.measure('render_changed', lambda: manager.update_rank_message(guild))
+    await bench.measure('remove_top', lambda: manager.remove_rank(guild, guild.get_member(member_at(1))))
+
+    # Every tenth rank left empty
+    seed_ladder(manager, guild, {uid: rank + rank // 10 for uid, rank in state.user_ranks.items()})
+    await manager.flush()
+    await bench.measure('fill_gaps', lambda: manager.fill_rank_gaps(guild))
+
+    drifted = random.Random(size).sample(guild.members, max(1, int(size * RECONCILE_SHARE)))
+    for member in drifted:
+        member.nick = f"{member.name} #0"
+        manager.mark_member_dirty(member)
+    await bench.measure('reconcile', lambda: manager.reconcile_dirty_members(guild))
+
+    await manager.close()
+    return bench.results
+
+
+async def main(args: argparse.Namespace):
+    with tempfile.TemporaryDirectory() as data_dir:
+        config.RANK_STORAGE = args.storage
+        config.RANK_DATABASE = None
+        config.RANK_CHANNEL_NAME = config.RANK_CHANNEL_NAME or 'ranks'
+        results = []
+        for size in args.sizes:
+            # Each size starts from empty storage
+            storage.DATA_DIR = tempfile.mkdtemp(dir=data_dir)
+            results.extend(await run_size(size, args.latency, not args.no_memory))
+    report = {
+        'python': platform.python_version(),
+        'storage': args.storage,
+        'latency_s': args.latency,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark RankManager operations on fake guilds.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help="ladder sizes to run")
+    parser.add_argument('--latency', type=float, default=0.0, help="simulated seconds per API call")
+    parser.add_argument('--storage', choices=('json', 'sqlite'), default='json', help="storage backend")
+    parser.add_argument('--no-memory', action='store_true', help="skip tracemalloc, which slows allocations down")
+    parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,641 @@
+"""
+Local stand-in for the Discord REST API and gateway, for end-to-end load tests of the bot.
+
+Usage:
+    python -m benchmarks.fake_discord --port 8080 --guilds 1 --members 10000 --latency 0.05 --rate-429 0.01
+
+Then point the bot at it:
+    DISCORD_API_BASE=http://127.0.0.1:8080/api/v10 DISCORD_GATEWAY_URL=ws://127.0.0.1:8080/gateway python bot.py
+
+Only the endpoints and gateway events the bot uses are implemented. Every rate-limited
+route answers with Discord-like X-RateLimit headers from per-route buckets, and 429s and
+latency can be injected. Member updates, joins and rank commands can be emitted through
+the control endpoints under /_fake:
+
+    POST /_fake/guilds/{guild_id}/members/{member_id}/nick   {"nick": "..."}
+    POST /_fake/guilds/{guild_id}/members                    {"count": 1}
+    POST /_fake/guilds/{guild_id}/rank_set                   {"member_id": ..., "new_rank": ...}
+    POST /_fake/faults                                       {"latency": 0.05, "rate_429": 0.01}
+    GET  /_fake/stats
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from aiohttp import WSMsgType, web
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = '/api/v10'
+BOT_USER_ID = 900000000000000001
+APPLICATION_ID = 900000000000000002
+FIRST_GUILD_ID = 100000000000000000
+FIRST_MEMBER_ID = 200000000000000000
+DISCORD_EPOCH_MS = 1420070400000
+# Members per GUILD_MEMBERS_CHUNK, as on Discord
+CHUNK_SIZE = 1000
+HEARTBEAT_INTERVAL_MS = 41250
+
+OP_DISPATCH = 0
+OP_HEARTBEAT = 1
+OP_IDENTIFY = 2
+OP_REQUEST_MEMBERS = 8
+OP_HELLO = 10
+OP_HEARTBEAT_ACK = 11
+
+
+def json_response(data, status: int = 200, headers: Optional[Dict[str, str]] = None) -> web.Response:
+    """JSON response without a charset, since discord.py only parses exactly 'application/json'."""
+    return web.Response(
+        body=json.dumps(data).encode(), status=status, headers={**(headers or {}), 'Content-Type': 'application/json'}
+    )
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _user(user_id: int, username: str, bot: bool = False) -> dict:
+    return {
+        'id': str(user_id),
+        'username': username,
+        'discriminator': '0',
+        'global_name': None,
+        'avatar': None,
+        'bot': bot,
+    }
+
+
+class FakeGuildData:
+    """Members, channels and messages of one fake guild."""
+
+    def __init__(self, guild_id: int, member_count: int):
+        self.id = guild_id
+        self.name = f"fake-guild-{guild_id - FIRST_GUILD_ID}"
+        self.joined_at = _now()
+        self.members: Dict[int, dict] = {}
+        self.channels: Dict[int, dict] = {}
+        self.messages: Dict[int, Dict[int, dict]] = {}
+        self.add_member(BOT_USER_ID, 'rank-bot', bot=True)
+        for index in range(member_count):
+            self.add_member(FIRST_MEMBER_ID + (guild_id - FIRST_GUILD_ID) * 10_000_000 + index, f"member{index}")
+
+    def add_member(self, member_id: int, username: str, bot: bool = False) -> dict:
+        member = {
+            'user': _user(member_id, username, bot),
+            'nick': None,
+            'roles': [],
+            'joined_at': self.joined_at,
+            'deaf': False,
+            'mute': False,
+            'flags': 0,
+        }
+        self.members[member_id] = member
+        return member
+
+    def payload(self) -> dict:
+        """GUILD_CREATE payload. Only the bot's own member is included; the rest is chunked."""
+        return {
+            'id': str(self.id),
+            'name': self.name,
+            'icon': None,
+            # Owning the guild gives the bot every permission
+            'owner_id': str(BOT_USER_ID),
+            'roles': [{
+                'id': str(self.id),
+                'name': '@everyone',
+                'permissions': '0',
+                'position': 0,
+                'color': 0,
+                'hoist': False,
+                'managed': False,
+                'mentionable': False,
+                'flags': 0,
+            }],
+            'channels': list(self.channels.values()),
+            'members': [self.members[BOT_USER_ID]],
+            'member_count': len(self.members),
+            'large': len(self.members) > 250,
+            'unavailable': False,
+            'features': [],
+            'emojis': [],
+            'stickers': [],
+            'threads': [],
+            'presences': [],
+            'voice_states': [],
+            'stage_instances': [],
+            'guild_scheduled_events': [],
+            'verification_level': 0,
+            'default_message_notifications': 0,
+            'explicit_content_filter': 0,
+            'mfa_level': 0,
+            'premium_tier': 0,
+            'preferred_locale': 'en-US',
+            'nsfw_level': 0,
+        }
+
+
+class RateLimitBuckets:
+    """Per-route buckets that refill `limit` requests every `window` seconds."""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        # bucket key -> (remaining, monotonic reset)
+        self.buckets: Dict[str, Tuple[int, float]] = {}
+
+    def take(self, key: str) -> Tuple[bool, Dict[str, str]]:
+        """Takes one request from a bucket. Returns whether it was allowed and the headers to send."""
+        now = time.monotonic()
+        remaining, reset = self.buckets.get(key, (self.limit, now + self.window))
+        if now >= reset:
+            remaining, reset = self.limit, now + self.window
+        allowed = remaining > 0
+        if allowed:
+            remaining -= 1
+        self.buckets[key] = (remaining, reset)
+        reset_after = max(0.0, reset - now)
+        headers = {
+            'X-RateLimit-Limit': str(self.limit),
+            'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset': f"{time.time() + reset_after:.3f}",
+            'X-RateLimit-Reset-After': f"{reset_after:.3f}",
+            'X-RateLimit-Bucket': key.split(':', 1)[0],
+        }
+        return allowed, headers
+
+
+class GatewaySession:
+    """One connected gateway client."""
+
+    def __init__(self, ws: web.WebSocketResponse):
+        self.ws = ws
+        self.sequence = itertools.count(1)
+        self.identified = False
+
+    async def send(self, op: int, data=None, event: Optional[str] = None):
+        payload = {'op': op, 'd': data, 's': None, 't': event}
+        if op == OP_DISPATCH:
+            payload['s'] = next(self.sequence)
+        await self.ws.send_str(json.dumps(payload))
+
+
+class FakeDiscord:
+    """
+    The fake API server.
+    `latency` is added to every REST request, and `rate_429` is the share of
+    rate-limited requests answered with a 429 regardless of their bucket.
+    """
+
+    def __init__(
+        self,
+        guilds: int,
+        members: int,
+        latency: float = 0.0,
+        rate_429: float = 0.0,
+        bucket_limit: int = 10,
+        bucket_window: float = 10.0,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.random = random.Random(seed)
+        self.buckets = RateLimitBuckets(bucket_limit, bucket_window)
+        self.guilds: Dict[int, FakeGuildData] = {
+            FIRST_GUILD_ID + index: FakeGuildData(FIRST_GUILD_ID + index, members) for index in range(guilds)
+        }
+        self.sessions: Set[GatewaySession] = set()
+        # Ids of new objects encode the current time like real snowflakes, so clients
+        # see interactions as fresh instead of long expired
+        self.snowflakes = itertools.count((int(time.time() * 1000) - DISCORD_EPOCH_MS) << 22)
+        self.stats: Counter = Counter()
+        self.app = self._build_app()
+
+    def _build_app(self) -> web.Application:
+        app = web.Application()
+        limited = [
+            ('GET', '/guilds/{guild_id}/members', self.list_members),
+            ('GET', '/guilds/{guild_id}/members/{member_id}', self.get_member),
+            ('PATCH', '/guilds/{guild_id}/members/{member_id}', self.edit_member),
+            ('POST', '/guilds/{guild_id}/channels', self.create_channel),
+            ('POST', '/channels/{channel_id}/messages', self.send_message),
+            ('GET', '/channels/{channel_id}/messages/{message_id}', self.get_message),
+            ('PATCH', '/channels/{channel_id}/messages/{message_id}', self.edit_message),
+            ('DELETE', '/channels/{channel_id}/messages/{message_id}', self.delete_message),
+            ('POST', '/interactions/{interaction_id}/{token}/callback', self.interaction_callback),
+            ('POST', '/webhooks/{application_id}/{token}', self.send_followup),
+            ('PATCH', '/webhooks/{application_id}/{token}/messages/{message_id}', self.edit_followup),
+        ]
+        for method, path, handler in limited:
+            app.router.add_route(method, API_PREFIX + path, self._limited(method, path, handler))
+        app.router.add_get(API_PREFIX + '/users/@me', self.get_current_user)
+        app.router.add_get(API_PREFIX + '/oauth2/applications/@me', self.get_application)
+        app.router.add_get(API_PREFIX + '/gateway', self.get_gateway)
+        app.router.add_get(API_PREFIX + '/gateway/bot', self.get_gateway)
+        app.router.add_put(API_PREFIX + '/applications/{application_id}/commands', self.sync_commands)
+        app.router.add_get('/gateway', self.gateway)
+        app.router.add_post('/_fake/guilds/{guild_id}/members/{member_id}/nick', self.control_nick)
+        app.router.add_post('/_fake/guilds/{guild_id}/members', self.control_join)
+        app.router.add_post('/_fake/guilds/{guild_id}/rank_set', self.control_rank_set)
+        app.router.add_post('/_fake/faults', self.control_faults)
+        app.router.add_get('/_fake/stats', self.control_stats)
+        return app
+
+    def _limited(self, method: str, path: str, handler):
+        """Wraps a handler with latency, rate-limit buckets and injected 429s."""
+        async def wrapped(request: web.Request) -> web.Response:
+            route = f"{method} {path}"
+            self.stats[route] += 1
+            if self.latency > 0:
+                await asyncio.sleep(self.latency)
+            # Buckets are per route and major parameter, as on Discord
+            major = next(
+                (request.match_info[name] for name in ('guild_id', 'channel_id', 'token') if name in request.match_info), ''
+            )
+            bucket = f"{abs(hash(route)) % 10 ** 8:08x}:{major}"
+            allowed, headers = self.buckets.take(bucket)
+            if not allowed or self.random.random() < self.rate_429:
+                self.stats['429'] += 1
+                retry_after = float(headers['X-RateLimit-Reset-After']) if not allowed else 0.5
+                self.stats['retry_after_total'] += retry_after
+                headers.update({
+                    'Retry-After': f"{retry_after:.3f}",
+                    'X-RateLimit-Scope': 'user',
+                    # discord.py treats a 429 without this header as a Cloudflare ban
+                    'Via': '1.1 google',
+                })
+                return json_response(
+                    {'message': 'You are being rate limited.', 'retry_after': retry_after, 'global': False},
+                    status=429, headers=headers
+                )
+            response = await handler(request)
+            response.headers.update(headers)
+            return response
+        return wrapped
+
+    def _guild(self, request: web.Request) -> FakeGuildData:
+        guild = self.guilds.get(int(request.match_info['guild_id']))
+        if guild is None:
+            raise web.HTTPNotFound(body=json.dumps({'message': 'Unknown Guild', 'code': 10004}).encode(),
+                                   headers={'Content-Type': 'application/json'})
+        return guild
+
+    def _channel(self, request: web.Request) -> Tuple[FakeGuildData, dict]:
+        channel_id = int(request.match_info['channel_id'])
+        for guild in self.guilds.values():
+            if channel_id in guild.channels:
+                return guild, guild.channels[channel_id]
+        raise web.HTTPNotFound(body=json.dumps({'message': 'Unknown Channel', 'code': 10003}).encode(),
+                               headers={'Content-Type': 'application/json'})
+
+    @staticmethod
+    def _not_found(message: str, code: int) -> web.Response:
+        return json_response({'message': message, 'code': code}, status=404)
+
+    # Gateway
+
+    async def dispatch(self, event: str, data: dict):
+        """Sends a dispatch event to every identified gateway session."""
+        for session in list(self.sessions):
+            if session.identified:
+                try:
+                    await session.send(OP_DISPATCH, data, event)
+                except ConnectionError:
+                    self.sessions.discard(session)
+
+    async def gateway(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        session = GatewaySession(ws)
+        self.sessions.add(session)
+        await session.send(OP_HELLO, {'heartbeat_interval': HEARTBEAT_INTERVAL_MS})
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                payload = json.loads(message.data)
+                op = payload.get('op')
+                if op == OP_HEARTBEAT:
+                    await session.send(OP_HEARTBEAT_ACK)
+                elif op == OP_IDENTIFY:
+                    await self._identify(session)
+                elif op == OP_REQUEST_MEMBERS:
+                    await self._send_member_chunks(session, payload['d'])
+        finally:
+            self.sessions.discard(session)
+        return ws
+
+    async def _identify(self, session: GatewaySession):
+        session.identified = True
+        await session.send(OP_DISPATCH, {
+            'v': 10,
+            'user': _user(BOT_USER_ID, 'rank-bot', bot=True),
+            'guilds': [{'id': str(guild_id), 'unavailable': True} for guild_id in self.guilds],
+            'session_id': f"fake-{id(session)}",
+            'resume_gateway_url': 'ws://127.0.0.1/gateway',
+            'application': {'id': str(APPLICATION_ID), 'flags': 0},
+            'shard': [0, 1],
+        }, 'READY')
+        for guild in self.guilds.values():
+            await session.send(OP_DISPATCH, guild.payload(), 'GUILD_CREATE')
+
+    async def _send_member_chunks(self, session: GatewaySession, request: dict):
+        guild = self.guilds.get(int(request['guild_id']))
+        if guild is None:
+            return
+        user_ids = request.get('user_ids')
+        not_found: List[str] = []
+        if user_ids:
+            members = []
+            for user_id in user_ids:
+                member = guild.members.get(int(user_id))
+                if member is None:
+                    not_found.append(str(user_id))
+                else:
+                    members.append(member)
+        else:
+            query = request.get('query') or ''
+            members = [m for m in guild.members.values() if m['user']['username'].startswith(query)]
+            if request.get('limit'):
+                members = members[:request['limit']]
+        chunk_count = max(1, -(-len(members) // CHUNK_SIZE))
+        for index in range(chunk_count):
+            await session.send(OP_DISPATCH, {
+                'guild_id': str(guild.id),
+                'members': members[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE],
+                'chunk_index': index,
+                'chunk_count': chunk_count,
+                'not_found': not_found if index == 0 else [],
+                'nonce': request.get('nonce'),
+            }, 'GUILD_MEMBERS_CHUNK')
+
+    # Rest
+
+    async def get_current_user(self, request: web.Request) -> web.Response:
+        return json_response(_user(BOT_USER_ID, 'rank-bot', bot=True))
+
+    async def get_application(self, request: web.Request) -> web.Response:
+        return json_response({
+            'id': str(APPLICATION_ID),
+            'name': 'rank-bot',
+            'icon': None,
+            'description': '',
+            'bot_public': False,
+            'bot_require_code_grant': False,
+            'owner': _user(BOT_USER_ID + 100, 'owner'),
+            'verify_key': '',
+            'flags': 0,
+        })
+
+    async def get_gateway(self, request: web.Request) -> web.Response:
+        url = f"ws://{request.host}/gateway"
+        return json_response({
+            'url': url,
+            'shards': 1,
+            'session_start_limit': {'total': 1000, 'remaining': 1000, 'reset_after': 0, 'max_concurrency': 1},
+        })
+
+    async def sync_commands(self, request: web.Request) -> web.Response:
+        commands = await request.json()
+        for command in commands:
+            command.update({'id': str(next(self.snowflakes)), 'application_id': str(APPLICATION_ID), 'version': '1'})
+        return json_response(commands)
+
+    async def list_members(self, request: web.Request) -> web.Response:
+        guild = self._guild(request)
+        limit = min(int(request.query.get('limit', 1)), 1000)
+        after = int(request.query.get('after', 0))
+        members = sorted((m for member_id, m in guild.members.items() if member_id > after),
+                         key=lambda m: int(m['user']['id']))
+        return json_response(members[:limit])
+
+    async def get_member(self, request: web.Request) -> web.Response:
+        member = self._guild(request).members.get(int(request.match_info['member_id']))
+        if member is None:
+            return self._not_found('Unknown Member', 10007)
+        return json_response(member)
+
+    async def edit_member(self, request: web.Request) -> web.Response:
+        guild = self._guild(request)
+        member = guild.members.get(int(request.match_info['member_id']))
+        if member is None:
+            return self._not_found('Unknown Member', 10007)
+        body = await request.json()
+        if 'nick' in body:
+            member['nick'] = body['nick'] or None
+            await self.dispatch('GUILD_MEMBER_UPDATE', {'guild_id': str(guild.id), **member})
+        return json_response(member)
+
+    async def create_channel(self, request: web.Request) -> web.Response:
+        guild = self._guild(request)
+        body = await request.json()
+        channel = {
+            'id': str(next(self.snowflakes)),
+            'type': body.get('type', 0),
+            'guild_id': str(guild.id),
+            'name': body['name'],
+            'position': len(guild.channels),
+            'permission_overwrites': body.get('permission_overwrites', []),
+            'nsfw': False,
+            'parent_id': None,
+            'topic': None,
+            'last_message_id': None,
+            'rate_limit_per_user': 0,
+        }
+        guild.channels[int(channel['id'])] = channel
+        guild.messages[int(channel['id'])] = {}
+        await self.dispatch('CHANNEL_CREATE', channel)
+        return json_response(channel)
+
+    def _message(self, channel: dict, message_id: int, content: str) -> dict:
+        return {
+            'id': str(message_id),
+            'channel_id': channel['id'],
+            'guild_id': channel['guild_id'],
+            'author': _user(BOT_USER_ID, 'rank-bot', bot=True),
+            'content': content,
+            'timestamp': _now(),
+            'edited_timestamp': None,
+            'tts': False,
+            'mention_everyone': False,
+            'mentions': [],
+            'mention_roles': [],
+            'attachments': [],
+            'embeds': [],
+            'pinned': False,
+            'type': 0,
+            'flags': 0,
+            'components': [],
+        }
+
+    async def send_message(self, request: web.Request) -> web.Response:
+        guild, channel = self._channel(request)
+        body = await request.json()
+        message = self._message(channel, next(self.snowflakes), body.get('content', ''))
+        guild.messages[int(channel['id'])][int(message['id'])] = message
+        return json_response(message)
+
+    async def get_message(self, request: web.Request) -> web.Response:
+        guild, channel = self._channel(request)
+        message = guild.messages[int(channel['id'])].get(int(request.match_info['message_id']))
+        if message is None:
+            return self._not_found('Unknown Message', 10008)
+        return json_response(message)
+
+    async def edit_message(self, request: web.Request) -> web.Response:
+        guild, channel = self._channel(request)
+        message = guild.messages[int(channel['id'])].get(int(request.match_info['message_id']))
+        if message is None:
+            return self._not_found('Unknown Message', 10008)
+        body = await request.json()
+        message['content'] = body.get('content', message['content'])
+        message['edited_timestamp'] = _now()
+        return json_response(message)
+
+    async def delete_message(self, request: web.Request) -> web.Response:
+        guild, channel = self._channel(request)
+        if guild.messages[int(channel['id'])].pop(int(request.match_info['message_id']), None) is None:
+            return self._not_found('Unknown Message', 10008)
+        return web.Response(status=204)
+
+    async def interaction_callback(self, request: web.Request) -> web.Response:
+        return web.Response(status=204)
+
+    async def send_followup(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        channel = {'id': '0', 'guild_id': None}
+        self.stats['followups'] += 1
+        logger.info(f"Interaction followup: {body.get('content')}")
+        return json_response(self._message(channel, next(self.snowflakes), body.get('content', '')))
+
+    async def edit_followup(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        channel = {'id': '0', 'guild_id': None}
+        self.stats['followup_edits'] += 1
+        logger.info(f"Interaction followup edited: {body.get('content')}")
+        return json_response(self._message(channel, int(request.match_info['message_id']), body.get('content', '')))
+
+    # Control
+
+    async def control_nick(self, request: web.Request) -> web.Response:
+        """Changes a nickname as if the member did it, and emits GUILD_MEMBER_UPDATE."""
+        guild = self._guild(request)
+        member = guild.members.get(int(request.match_info['member_id']))
+        if member is None:
+            return self._not_found('Unknown Member', 10007)
+        body = await request.json()
+        member['nick'] = body.get('nick')
+        await self.dispatch('GUILD_MEMBER_UPDATE', {'guild_id': str(guild.id), **member})
+        return json_response(member)
+
+    async def control_join(self, request: web.Request) -> web.Response:
+        """Adds members to a guild and emits GUILD_MEMBER_ADD for each."""
+        guild = self._guild(request)
+        body = await request.json() if request.can_read_body else {}
+        joined = []
+        for _ in range(body.get('count', 1)):
+            member_id = next(self.snowflakes)
+            member = guild.add_member(member_id, f"joined{member_id}")
+            member['nick'] = body.get('nick')
+            await self.dispatch('GUILD_MEMBER_ADD', {'guild_id': str(guild.id), **member})
+            joined.append(member)
+        return json_response(joined)
+
+    async def control_rank_set(self, request: web.Request) -> web.Response:
+        """Invokes '/rank set' as the guild owner by emitting INTERACTION_CREATE."""
+        guild = self._guild(request)
+        body = await request.json()
+        target = guild.members.get(int(body['member_id']))
+        if target is None:
+            return self._not_found('Unknown Member', 10007)
+        invoker = {**guild.members[BOT_USER_ID], 'permissions': str((1 << 41) - 1)}
+        interaction_id = next(self.snowflakes)
+        await self.dispatch('INTERACTION_CREATE', {
+            'id': str(interaction_id),
+            'application_id': str(APPLICATION_ID),
+            'type': 2,
+            'token': f"token-{interaction_id}",
+            'version': 1,
+            'guild_id': str(guild.id),
+            'channel_id': str(next(iter(guild.channels), guild.id)),
+            'member': invoker,
+            'app_permissions': str((1 << 41) - 1),
+            'locale': 'en-US',
+            'guild_locale': 'en-US',
+            'entitlements': [],
+            'authorizing_integration_owners': {},
+            'data': {
+                'id': str(APPLICATION_ID + 1),
+                'name': 'rank',
+                'type': 1,
+                'options': [{
+                    'name': 'set',
+                    'type': 1,
+                    'options': [
+                        {'name': 'member', 'type': 6, 'value': str(target['user']['id'])},
+                        {'name': 'new_rank', 'type': 4, 'value': int(body['new_rank'])},
+                    ],
+                }],
+                'resolved': {
+                    'users': {target['user']['id']: target['user']},
+                    'members': {
+                        target['user']['id']: {
+                            **{key: value for key, value in target.items() if key != 'user'},
+                            'permissions': '0',
+                        }
+                    },
+                },
+            },
+        })
+        return json_response({'interaction_id': str(interaction_id)})
+
+    async def control_faults(self, request: web.Request) -> web.Response:
+        """Changes the injected latency and 429 share while the server runs."""
+        body = await request.json()
+        self.latency = float(body.get('latency', self.latency))
+        self.rate_429 = float(body.get('rate_429', self.rate_429))
+        return json_response({'latency': self.latency, 'rate_429': self.rate_429})
+
+    async def control_stats(self, request: web.Request) -> web.Response:
+        ranked = sum(
+            1 for guild in self.guilds.values() for member in guild.members.values()
+            if member['nick'] and '#' in member['nick']
+        )
+        return json_response({'requests': dict(self.stats), 'members_with_rank': ranked})
+
+    async def start(self, host: str, port: int) -> web.AppRunner:
+        runner = web.AppRunner(self.app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info(f"Fake Discord listening on http://{host}:{port}{API_PREFIX}")
+        return runner
+
+
+async def main(args: argparse.Namespace):
+    server = FakeDiscord(
+        args.guilds, args.members, args.latency, args.rate_429, args.bucket_limit, args.bucket_window, args.seed
+    )
+    await server.start(args.host, args.port)
+    await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Discord API and gateway.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--guilds', type=int, default=1, help="number of guilds")
+    parser.add_argument('--members', type=int, default=1000, help="members per guild")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every REST request")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="share of requests answered with an injected 429")
+    parser.add_argument('--bucket-limit', type=int, default=10, help="requests per rate-limit bucket and window")
+    parser.add_argument('--bucket-window', type=float, default=10.0, help="seconds per rate-limit window")
+    parser.add_argument('--seed', type=int, default=0)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,160 @@
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional
+
+import discord
+
+
+class ApiCalls:
+    """Counts simulated Discord API calls by route and adds a fixed latency to each."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.counts: Counter = Counter()
+
+    async def call(self, route: str):
+        self.counts[route] += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        else:
+            # A real request always yields to the event loop at least once
+            await asyncio.sleep(0)
+
+    def reset(self):
+        self.counts.clear()
+
+
+def _not_found() -> discord.NotFound:
+    return discord.NotFound(SimpleNamespace(status=404, reason='Not Found'), 'Unknown')
+
+
+class FakeMember:
+    """Stand-in for discord.Member with the attributes the rank manager uses."""
+
+    __slots__ = ('id', 'name', 'nick', 'guild')
+
+    def __init__(self, member_id: int, guild: 'FakeGuild', nick: Optional[str] = None):
+        self.id = member_id
+        self.name = f"user{member_id}"
+        self.nick = nick
+        self.guild = guild
+
+    @property
+    def display_name(self) -> str:
+        return self.nick or self.name
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    async def edit(self, nick: Optional[str] = None):
+        await self.guild.api.call('member.edit')
+        self.nick = nick
+
+
+class FakeMessage:
+    """Stand-in for discord.Message and discord.PartialMessage."""
+
+    def __init__(self, channel: 'FakeChannel', message_id: int, content: Optional[str] = None):
+        self.channel = channel
+        self.id = message_id
+        self.content = content
+
+    async def edit(self, content: Optional[str] = None):
+        await self.channel.guild.api.call('message.edit')
+        if self.id not in self.channel.messages:
+            raise _not_found()
+        self.channel.messages[self.id].content = content
+
+    async def delete(self):
+        await self.channel.guild.api.call('message.delete')
+        if self.channel.messages.pop(self.id, None) is None:
+            raise _not_found()
+
+
+class FakeChannel:
+    """Stand-in for discord.TextChannel."""
+
+    def __init__(self, guild: 'FakeGuild', channel_id: int, name: str):
+        self.guild = guild
+        self.id = channel_id
+        self.name = name
+        self.messages: Dict[int, FakeMessage] = {}
+        self._next_message_id = channel_id * 1000
+
+    async def send(self, content: str) -> FakeMessage:
+        await self.guild.api.call('message.send')
+        self._next_message_id += 1
+        message = FakeMessage(self, self._next_message_id, content)
+        self.messages[message.id] = message
+        return message
+
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        await self.guild.api.call('message.fetch')
+        if message_id not in self.messages:
+            raise _not_found()
+        return self.messages[message_id]
+
+    def get_partial_message(self, message_id: int) -> FakeMessage:
+        return FakeMessage(self, message_id)
+
+
+class FakeGuild:
+    """
+    Stand-in for discord.Guild holding `size` members, all in the member cache.
+    Every REST and gateway call is counted on `api`.
+    """
+
+    def __init__(self, guild_id: int, size: int, api: ApiCalls):
+        self.id = guild_id
+        self.name = f"bench-{guild_id}"
+        self.api = api
+        self.me = SimpleNamespace(guild_permissions=SimpleNamespace(manage_nicknames=True))
+        self.default_role = discord.Object(id=guild_id)
+        self._members: Dict[int, FakeMember] = {
+            member_id: FakeMember(member_id, self) for member_id in range(1, size + 1)
+        }
+        self.text_channels: List[FakeChannel] = []
+        self.chunked = True
+
+    @property
+    def members(self) -> List[FakeMember]:
+        return list(self._members.values())
+
+    @property
+    def member_count(self) -> int:
+        return len(self._members)
+
+    def get_member(self, member_id: int) -> Optional[FakeMember]:
+        return self._members.get(member_id)
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return next((channel for channel in self.text_channels if channel.id == channel_id), None)
+
+    async def fetch_member(self, member_id: int) -> FakeMember:
+        await self.api.call('member.fetch')
+        member = self._members.get(member_id)
+        if member is None:
+            raise _not_found()
+        return member
+
+    async def query_members(self, user_ids: Iterable[int] = (), limit: int = 5, cache: bool = False) -> List[FakeMember]:
+        await self.api.call('gateway.query_members')
+        return [self._members[member_id] for member_id in user_ids if member_id in self._members]
+
+    async def fetch_members(self, limit: Optional[int] = None):
+        members = self.members
+        for start in range(0, len(members), 1000):
+            await self.api.call('member.list')
+            for member in members[start:start + 1000]:
+                yield member
+
+    async def chunk(self):
+        await self.api.call('gateway.chunk')
+
+    async def create_text_channel(self, name: str, overwrites=None) -> FakeChannel:
+        await self.api.call('channel.create')
+        channel = FakeChannel(self, self.id * 10 + len(self.text_channels) + 1, name)
+        self.text_channels.append(channel)
+        return channel
@@ -1,9 +1,14 @@
 import logging
 
 import discord
+import yarl
 from discord.ext import commands
 
 from cogs.rank_cog import RankCog
+from utils import tracing
+from utils.loop_monitor import LoopLagMonitor
+from utils.metrics import start_metrics_server
+from utils.rate_limits import RateLimitTracker
 import config
 
 # Configure logging
@@ -13,6 +18,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+tracing.configure(config.TRACE_SLOW_THRESHOLD, config.TRACE_DIR, config.TRACE_FORMAT == 'chrome')
+
+if config.DISCORD_API_BASE:
+    discord.http.Route.BASE = config.DISCORD_API_BASE.rstrip('/')
+    logger.warning(f"Using the Discord API at {discord.http.Route.BASE}")
+if config.DISCORD_GATEWAY_URL:
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(config.DISCORD_GATEWAY_URL)
+    logger.warning(f"Using the Discord gateway at {config.DISCORD_GATEWAY_URL}")
+
 # Intents setup
 intents = discord.Intents.default()
 intents.members = True
@@ -21,13 +35,35 @@ intents.message_content = False
 class MyBot(commands.Bot):
     """Custom Discord bot class with setup hook for adding cogs and syncing commands."""
     def __init__(self):
-        super().__init__(command_prefix='!', intents=intents)
+        # Observes rate-limit headers so nickname edits can be paced per guild
+        self.rate_limits = RateLimitTracker()
+        # Guilds that are not chunked at startup are chunked when they are initialized
+        super().__init__(
+            command_prefix='!',
+            intents=intents,
+            chunk_guilds_at_startup=config.CHUNK_GUILDS_AT_STARTUP,
+            http_trace=self.rate_limits.trace_config(),
+        )
+        self.metrics_runner = None
+        self.loop_monitor = None
     
     async def setup_hook(self):
+        if config.LOOP_LAG_THRESHOLD:
+            self.loop_monitor = LoopLagMonitor(config.LOOP_LAG_INTERVAL, config.LOOP_LAG_THRESHOLD)
+            self.loop_monitor.start()
+        if config.METRICS_PORT:
+            self.metrics_runner = await start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
         await self.add_cog(RankCog(self))
         await self.tree.sync()
         logger.info("Application commands have been synced.")
 
+    async def close(self):
+        await super().close()
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+        if self.loop_monitor is not None:
+            await self.loop_monitor.stop()
+
 def main():
     bot = MyBot()
     bot.run(config.DISCORD_BOT_TOKEN)
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import time
 
@@ -5,6 +6,9 @@ import discord
 from discord.ext import commands, tasks
 from discord import app_commands
 
+from utils import metrics, tracing
+from utils.member_stream import guild_members
+from utils.propagation import PropagationJob
 from utils.rank_manager import RankManager
 import config
 
@@ -14,38 +18,80 @@ class RankCog(commands.Cog):
     """Discord Cog that provides commands and listeners for managing user ranks."""
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.rank_manager = RankManager()
+        self.rank_manager = RankManager(getattr(bot, 'rate_limits', None))
+        # Limits how many guilds are initialized at once, on startup and as guilds join or come back
+        self.initialize_semaphore = asyncio.Semaphore(config.STARTUP_CONCURRENCY)
+        self.reconcile_nicknames.start()
         self.check_nicknames.start()
+
+    async def cog_unload(self):
+        """Stops the periodic checks and writes any pending rank changes before shutdown."""
+        self.reconcile_nicknames.cancel()
+        self.check_nicknames.cancel()
+        for guild in self.bot.guilds:
+            if guild.chunked and not self.rank_manager.dirty_members.get(guild.id):
+                self.rank_manager.store_fingerprint(guild)
+        await self.rank_manager.close()
     
     @commands.Cog.listener()
     async def on_ready(self):
         """
         Called when the bot is ready.
         Initializes user ranks for each guild and enforces ranks on Discord nicknames.
+        Guilds are initialized concurrently, at most STARTUP_CONCURRENCY at a time.
         """
         try:
             logger.info(f"{self.bot.user.name} has connected to Discord!")
-            for guild in self.bot.guilds:
+            start_time = time.monotonic()
+            await asyncio.gather(*(self.initialize_guild(guild, self.initialize_semaphore) for guild in self.bot.guilds))
+            logger.info(f"User ranks have been initialized in {time.monotonic() - start_time:.2f} seconds.")
+        except Exception as e:
+            logger.exception("An error occurred during on_ready")
+
+    async def initialize_guild(self, guild: discord.Guild, semaphore: asyncio.Semaphore):
+        """Loads or enforces the ranks of one guild and posts its rank list."""
+        async with semaphore, tracing.span('initialize guild', guild=guild.id):
+            start_time = time.monotonic()
+            try:
                 logger.info(f"Processing guild: {guild.name}")
-                # Fetch all members once during startup
-                members = [member async for member in guild.fetch_members(limit=None)]
-                logger.info(f"Fetched {len(members)} members from guild '{guild.name}'")
+                # Members come from the gateway cache, or are streamed over HTTP if chunking is unavailable
+                members = await guild_members(guild)
 
-                if not self.rank_manager.user_ranks:
+                if not self.rank_manager.get_state(guild.id).user_ranks:
                     # If no ranks in 'ranks.json', load from nicknames and save
                     logger.info("No ranks found in 'ranks.json', loading from Discord nicknames.")
                     await self.rank_manager.load_ranks_from_nicknames(guild, members)
                 else:
                     # Enforce ranks from 'ranks.json' onto Discord
                     logger.info("Ranks loaded from 'ranks.json', enforcing ranks on Discord.")
-                    await self.rank_manager.enforce_ranks_on_discord(guild, members)
+                    await self.rank_manager.enforce_ranks_on_startup(guild, members)
 
                 # Update the rank list message in the designated channel
                 await self.rank_manager.update_rank_message(guild)
-            logger.info("User ranks have been initialized.")
-        except Exception as e:
-            logger.exception("An error occurred during on_ready")
-    
+            except Exception:
+                # One failing guild must not keep the others from starting
+                logger.exception(f"An error occurred while initializing guild '{guild.name}'")
+            finally:
+                logger.info(f"Finished initializing guild '{guild.name}' in {time.monotonic() - start_time:.2f} seconds")
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        """Initializes a guild the bot was added to while running."""
+        logger.info(f"Joined guild: {guild.name}")
+        await self.initialize_guild(guild, self.initialize_semaphore)
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild: discord.Guild):
+        """
+        Initializes a guild that became available again after an outage, so it is chunked,
+        reconciled and audited like on startup. Guilds that become available before the bot
+        is ready are initialized by on_ready.
+        """
+        if not self.bot.is_ready():
+            return
+        logger.info(f"Guild became available: {guild.name}")
+        await self.initialize_guild(guild, self.initialize_semaphore)
+
     # Create a command group for 'rank'
     rank = app_commands.Group(name="rank", description="Commands to manage user ranks.")
 
@@ -71,26 +117,31 @@ class RankCog(commands.Cog):
 
         start_time = time.monotonic()  # Start timing the command execution
 
-        try:
-            if not isinstance(new_rank, int) or new_rank < 1:
-                await interaction.followup.send("🚫 Rank must be a positive integer.", ephemeral=True)
-                return
+        with tracing.span('rank set command', guild=interaction.guild.id, member=member.id, new_rank=new_rank):
+            try:
+                if not isinstance(new_rank, int) or new_rank < 1:
+                    await interaction.followup.send("🚫 Rank must be a positive integer.", ephemeral=True)
+                    return
 
-            old_rank = self.rank_manager.user_ranks.get(str(member.id))
-            await self.rank_manager.adjust_ranks(
-                interaction.guild, member.id, old_rank, new_rank
-            )
+                old_rank = self.rank_manager.get_state(interaction.guild.id).user_ranks.get(str(member.id))
+                job = await self.rank_manager.commit_rank_set(
+                    interaction.guild, member.id, old_rank, new_rank
+                )
 
-            await interaction.followup.send(f"✅ {member.mention}'s rank has been updated to {new_rank}.")
-        except Exception as e:
-            # Log the error and send an error message
-            logger.exception(f"An error occurred in rank set command for member {member.display_name} with rank {new_rank}")
-            if not interaction.is_expired():
-                await interaction.followup.send("🚫 An error occurred while processing the command.", ephemeral=True)
-        finally:
-            end_time = time.monotonic()
-            elapsed_time = end_time - start_time
-            logger.info(f"Rank set command executed in {elapsed_time:.2f} seconds")
+                # Nicknames are updated in the background; the reply shows their progress
+                await self.reply_and_propagate(
+                    interaction, job, f"✅ {member.mention}'s rank has been updated to {new_rank}."
+                )
+            except Exception as e:
+                # Log the error and send an error message
+                logger.exception(f"An error occurred in rank set command for member {member.display_name} with rank {new_rank}")
+                if not interaction.is_expired():
+                    await interaction.followup.send("🚫 An error occurred while processing the command.", ephemeral=True)
+            finally:
+                end_time = time.monotonic()
+                elapsed_time = end_time - start_time
+                metrics.COMMAND_DURATION.observe(elapsed_time, command='set', phase='total')
+                logger.info(f"Rank set command executed in {elapsed_time:.2f} seconds")
 
     @rank_set.error
     async def rank_set_error(self, interaction: discord.Interaction, error):
@@ -130,49 +181,24 @@ class RankCog(commands.Cog):
 
         start_time = time.monotonic()  # Start timing the command execution
 
-        try:
-            old_rank = self.rank_manager.user_ranks.pop(str(member.id), None)
-            if old_rank is None:
-                await interaction.followup.send(f"🚫 {member.mention} does not have a rank assigned.", ephemeral=True)
-                return
+        with tracing.span('rank remove command', guild=interaction.guild.id, member=member.id):
+            try:
+                job = await self.rank_manager.commit_rank_remove(interaction.guild, member)
+                if job is None:
+                    await interaction.followup.send(f"🚫 {member.mention} does not have a rank assigned.", ephemeral=True)
+                    return
 
-            # Decrement ranks of members with rank > old_rank
-            affected_user_ids = set()
-            for uid in self.rank_manager.user_ranks:
-                if self.rank_manager.user_ranks[uid] > old_rank:
-                    self.rank_manager.user_ranks[uid] -= 1
-                    affected_user_ids.add(uid)
-
-            # Update nicknames of affected members
-            for uid in affected_user_ids:
-                member_id = int(uid)
-                member = interaction.guild.get_member(member_id)
-                if member is None:
-                    try:
-                        member = await interaction.guild.fetch_member(member_id)
-                    except discord.NotFound:
-                        logger.warning(f"Member with ID {member_id} not found.")
-                        continue
-                rank = self.rank_manager.user_ranks[uid]
-                await self.rank_manager.update_nickname(member, rank)
-                logger.info(f"Updated nickname for {member.display_name} to include rank {rank}")
-
-            # Update the member's nickname to remove the rank
-            await self.rank_manager.update_nickname(member, None)
-            self.rank_manager.save_ranks_to_file()
-            # Update the rank list message
-            await self.rank_manager.update_rank_message(interaction.guild)
-
-            await interaction.followup.send(f"✅ {member.mention}'s rank has been removed.")
-        except Exception as e:
-            # Log the error and send an error message
-            logger.exception(f"An error occurred in rank remove command for member {member.display_name}")
-            if not interaction.is_expired():
-                await interaction.followup.send("🚫 An error occurred while processing the command.", ephemeral=True)
-        finally:
-            end_time = time.monotonic()
-            elapsed_time = end_time - start_time
-            logger.info(f"Rank remove command executed in {elapsed_time:.2f} seconds")
+                await self.reply_and_propagate(interaction, job, f"✅ {member.mention}'s rank has been removed.")
+            except Exception as e:
+                # Log the error and send an error message
+                logger.exception(f"An error occurred in rank remove command for member {member.display_name}")
+                if not interaction.is_expired():
+                    await interaction.followup.send("🚫 An error occurred while processing the command.", ephemeral=True)
+            finally:
+                end_time = time.monotonic()
+                elapsed_time = end_time - start_time
+                metrics.COMMAND_DURATION.observe(elapsed_time, command='remove', phase='total')
+                logger.info(f"Rank remove command executed in {elapsed_time:.2f} seconds")
 
         @rank_remove.error
         async def rank_remove_error(self, interaction: discord.Interaction, error):
@@ -189,17 +215,64 @@ class RankCog(commands.Cog):
                     await interaction.response.send_message("🚫 An unexpected error occurred.", ephemeral=True)
                 logger.exception("Error in rank remove command")
 
-    @tasks.loop(minutes=5)
+    async def reply_and_propagate(self, interaction: discord.Interaction, job: PropagationJob, confirmation: str):
+        """
+        Replies to a rank command right after its change is committed, then updates the nicknames
+        in the background, editing the reply with their progress and finally a summary.
+        """
+        if job.finished:
+            # Nothing left to wait for, though edits may have been refused already (missing permission)
+            await interaction.followup.send(f"{confirmation}\n{job.summary()}" if job.failed else confirmation)
+            self.rank_manager.start_propagation(interaction.guild, job)
+            return
+        message = await interaction.followup.send(f"{confirmation}\n{job.progress()}", wait=True)
+
+        async def on_progress(job: PropagationJob):
+            if not interaction.is_expired():
+                await message.edit(content=f"{confirmation}\n{job.progress()}")
+
+        async def on_done(job: PropagationJob):
+            if not interaction.is_expired():
+                await message.edit(content=f"{confirmation}\n{job.summary()}")
+            elif job.failed and interaction.channel is not None:
+                # The reply can no longer be edited once the interaction token expired
+                await interaction.channel.send(f"{confirmation}\n{job.summary()}")
+
+        self.rank_manager.start_propagation(interaction.guild, job, on_progress, on_done)
+
+    @tasks.loop(seconds=config.RECONCILE_INTERVAL)
+    async def reconcile_nicknames(self):
+        """
+        Enforces ranks on the members whose nicknames changed, who joined, or whose
+        nickname edit failed since the last pass.
+        """
+        for guild_id in list(self.rank_manager.dirty_members):
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                self.rank_manager.dirty_members.pop(guild_id, None)
+                continue
+            with tracing.span('reconcile', guild=guild.id):
+                checked = await self.rank_manager.reconcile_dirty_members(guild)
+            logger.debug(f"Reconciled {checked} changed members in guild '{guild.name}'")
+
+    @reconcile_nicknames.before_loop
+    async def before_reconcile_nicknames(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(seconds=config.AUDIT_TICK_INTERVAL)
     async def check_nicknames(self):
         """
-        Periodically checks and enforces ranks on Discord nicknames every 5 minutes.
-        Ensures that all members' nicknames are in sync with their assigned ranks.
+        Checks the next slice of every guild's members in a rolling audit, so a full pass
+        over all nicknames is spread evenly over AUDIT_PERIOD seconds.
+        A safety net for changes missed by event-driven reconciliation.
         """
-        logger.info("Periodic check: Enforcing ranks on Discord nicknames...")
         for guild in self.bot.guilds:
-            # Use cached members
-            members = guild.members
-            await self.rank_manager.enforce_ranks_on_discord(guild, members)
+            if self.bot.intents.members and not guild.chunked:
+                # Not warmed up yet; auditing a partial member cache would skip members
+                continue
+            slice_size = self.rank_manager.audit_slice_size(guild.member_count or len(guild.members))
+            with tracing.span('audit', guild=guild.id, slice_size=slice_size):
+                await self.rank_manager.audit_next_slice(guild, slice_size)
 
     @check_nicknames.before_loop
     async def before_check_nicknames(self):
@@ -209,27 +282,45 @@ class RankCog(commands.Cog):
     async def on_member_join(self, member: discord.Member):
         """
         Handles new members joining the guild.
-        Enforces ranks on their nickname in case they should have a rank.
+        Schedules their nickname for reconciliation in case they should have a rank.
         """
         logger.info(f"New member joined: {member.display_name}")
-        # Enforce rank on the new member
-        await self.rank_manager.enforce_ranks_on_discord(member.guild, [member])
+        self.rank_manager.resolver.forget(member.guild.id, member.id)
+        self.rank_manager.mark_member_dirty(member)
 
     @commands.Cog.listener()
     async def on_member_update(self, before: discord.Member, after: discord.Member):
         if before.nick != after.nick:
+            if self.rank_manager.is_own_nickname_update(after):
+                # Echo of a nickname the bot just set; nothing to check
+                return
             logger.info(f"Member nickname changed: {before.display_name} -> {after.display_name}")
+            # The rank in the new nickname is checked on the next reconciliation pass
+            self.rank_manager.mark_member_dirty(after)
 
-            # Check if the rank in the nickname matches the expected rank
-            expected_rank = self.rank_manager.user_ranks.get(str(after.id))
-            current_rank_in_nickname = self.rank_manager.parse_rank(after.nick)
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        """Re-posts a rank list page that was deleted."""
+        guild = self.bot.get_guild(payload.guild_id) if payload.guild_id else None
+        if guild is not None:
+            self.rank_manager.forget_rank_message(guild, payload.message_id)
 
-            if expected_rank is not None and current_rank_in_nickname != expected_rank:
-                logger.info(f"Enforcing correct rank for {after.display_name}")
-                await self.rank_manager.update_nickname(after, expected_rank)
-            elif expected_rank is None and current_rank_in_nickname is not None:
-                logger.info(f"Removing rank from nickname of {after.display_name} as they should not have one")
-                await self.rank_manager.update_nickname(after, None)
-            else:
-                # Nickname is already correct; no action needed
-                logger.debug(f"Nickname for {after.display_name} is already correct.")
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        """Re-posts rank list pages removed by a bulk delete."""
+        guild = self.bot.get_guild(payload.guild_id) if payload.guild_id else None
+        if guild is not None:
+            # Every id is checked, since the earliest deleted page decides where reposting starts
+            for message_id in payload.message_ids:
+                self.rank_manager.forget_rank_message(guild, message_id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        """Drops the cached rank channel when it is deleted."""
+        self.rank_manager.forget_rank_channel(channel.guild, channel.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        """Drops the cached rank channel when it is renamed away from the configured name."""
+        if before.name != after.name and after.name != config.RANK_CHANNEL_NAME:
+            self.rank_manager.forget_rank_channel(after.guild, after.id)
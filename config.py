@@ -6,3 +6,71 @@ load_dotenv()
 AUTHORIZED_ROLE = os.getenv('AUTHORIZED_ROLE')
 RANK_CHANNEL_NAME = os.getenv('RANK_CHANNEL_NAME')
 DISCORD_BOT_TOKEN = os.getenv('DISCORD_BOT_TOKEN')
+
+# Alternative Discord REST and gateway endpoints, e.g. a local fake server for load tests
+DISCORD_API_BASE = os.getenv('DISCORD_API_BASE')
+DISCORD_GATEWAY_URL = os.getenv('DISCORD_GATEWAY_URL')
+
+# Seconds to coalesce rank changes before 'ranks.json' is rewritten
+RANK_SAVE_DELAY = float(os.getenv('RANK_SAVE_DELAY', '2.0'))
+
+# Number of journaled rank operations after which a fresh 'ranks.json' snapshot is written
+RANK_JOURNAL_COMPACT_THRESHOLD = int(os.getenv('RANK_JOURNAL_COMPACT_THRESHOLD', '1000'))
+
+# Rank storage backend: 'json' (snapshot plus journal) or 'sqlite'
+RANK_STORAGE = os.getenv('RANK_STORAGE', 'json').lower()
+# Path of the SQLite database; defaults to data/ranks.db
+RANK_DATABASE = os.getenv('RANK_DATABASE')
+
+# Parallel nickname edits per guild at startup, and retries of an edit on 429 or 5xx responses
+NICKNAME_EDIT_CONCURRENCY = int(os.getenv('NICKNAME_EDIT_CONCURRENCY', '4'))
+NICKNAME_EDIT_MAX_RETRIES = int(os.getenv('NICKNAME_EDIT_MAX_RETRIES', '3'))
+# Seconds to recognise member updates caused by the bot's own nickname edits
+NICKNAME_ECHO_TTL = float(os.getenv('NICKNAME_ECHO_TTL', '30'))
+# The parallel edit limits adapt to responses: the most per guild, the starting and most across
+# all guilds, and how many times slower than usual an edit must be to count as a latency spike
+NICKNAME_EDIT_MAX_CONCURRENCY = int(os.getenv('NICKNAME_EDIT_MAX_CONCURRENCY', '16'))
+NICKNAME_EDIT_GLOBAL_CONCURRENCY = int(os.getenv('NICKNAME_EDIT_GLOBAL_CONCURRENCY', '16'))
+NICKNAME_EDIT_GLOBAL_MAX_CONCURRENCY = int(os.getenv('NICKNAME_EDIT_GLOBAL_MAX_CONCURRENCY', '50'))
+NICKNAME_LATENCY_SPIKE_FACTOR = float(os.getenv('NICKNAME_LATENCY_SPIKE_FACTOR', '3'))
+# Weights of the interactive, event and audit lanes of nickname edits, e.g. '8,3,1';
+# empty drains each lane only once the higher ones are empty
+NICKNAME_LANE_WEIGHTS = [int(weight) for weight in os.getenv('NICKNAME_LANE_WEIGHTS', '').split(',') if weight.strip()] or None
+
+# Seconds to remember that a ranked member has left the guild before looking them up again
+MEMBER_NOT_FOUND_TTL = float(os.getenv('MEMBER_NOT_FOUND_TTL', '3600'))
+
+# Minimum seconds between two renders of a guild's rank list
+RANK_RENDER_INTERVAL = float(os.getenv('RANK_RENDER_INTERVAL', '10'))
+
+# Seconds between reconciliation passes over members whose nicknames changed
+RECONCILE_INTERVAL = float(os.getenv('RECONCILE_INTERVAL', '5'))
+
+# Request every guild's members before the bot is ready; otherwise each guild is chunked when it is initialized
+CHUNK_GUILDS_AT_STARTUP = os.getenv('CHUNK_GUILDS_AT_STARTUP', 'false').lower() in ('1', 'true', 'yes')
+# Number of guilds initialized at the same time, on startup or when they join or come back from an outage
+STARTUP_CONCURRENCY = int(os.getenv('STARTUP_CONCURRENCY', '4'))
+
+# Seconds over which the rolling audit checks every member's nickname once
+AUDIT_PERIOD = float(os.getenv('AUDIT_PERIOD', '3600'))
+# Seconds between two audit slices, and members per slice (0 derives it from AUDIT_PERIOD)
+AUDIT_TICK_INTERVAL = float(os.getenv('AUDIT_TICK_INTERVAL', '10'))
+AUDIT_SLICE_SIZE = int(os.getenv('AUDIT_SLICE_SIZE', '0'))
+
+# Port of the Prometheus metrics endpoint at /metrics (0 disables it), and the address it listens on
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+
+# Seconds after which a command or background operation has its trace exported (0 disables it),
+# the directory the traces are written to, and their format: 'json' or 'chrome' (trace-event format)
+TRACE_SLOW_THRESHOLD = float(os.getenv('TRACE_SLOW_THRESHOLD', '0'))
+TRACE_DIR = os.getenv('TRACE_DIR', os.path.join('data', 'traces'))
+TRACE_FORMAT = os.getenv('TRACE_FORMAT', 'json')
+
+# Seconds between event loop lag samples, and the lag in seconds after which the blocking
+# stack is logged (0 disables the monitor)
+LOOP_LAG_INTERVAL = float(os.getenv('LOOP_LAG_INTERVAL', '0.5'))
+LOOP_LAG_THRESHOLD = float(os.getenv('LOOP_LAG_THRESHOLD', '0.25'))
+
+# Seconds between progress updates of a rank command's reply while its nickname updates run
+PROPAGATION_PROGRESS_INTERVAL = float(os.getenv('PROPAGATION_PROGRESS_INTERVAL', '5'))
@@ -0,0 +1,102 @@
+import time
+import unittest
+
+from utils.adaptive_limit import LATENCY_WARMUP, AIMDLimit
+from utils.nickname_scheduler import NicknameScheduler
+
+GUILD_ID = 1
+
+
+class AIMDLimitTest(unittest.IsolatedAsyncioTestCase):
+    def warm_up(self, limit: AIMDLimit, latency: float = 0.1):
+        for _ in range(LATENCY_WARMUP):
+            limit.record(latency)
+
+    async def test_rate_limit_cuts_the_limit_once_per_cooldown(self):
+        limit = AIMDLimit(8, 1, 16, cooldown=60)
+        self.assertEqual(limit.record(0.1, rate_limited=True), 'rate_limit')
+        self.assertEqual(limit.limit, 4)
+        # A second 429 from the same round is not counted again
+        self.assertIsNone(limit.record(0.1, rate_limited=True))
+        self.assertEqual(limit.limit, 4)
+
+    async def test_rate_limited_latency_is_not_sampled(self):
+        limit = AIMDLimit(8, 1, 16, cooldown=0)
+        self.warm_up(limit)
+        limit.record(30.0, rate_limited=True)
+        self.assertAlmostEqual(limit.average_latency, 0.1)
+        self.assertEqual(limit.samples, LATENCY_WARMUP)
+
+    async def test_latency_spike_cuts_the_limit_after_warmup(self):
+        limit = AIMDLimit(8, 1, 16, latency_factor=3, cooldown=0)
+        self.assertIsNone(limit.record(0.1))
+        self.assertIsNone(limit.record(1.0))
+        self.assertEqual(limit.limit, 8)
+        self.warm_up(limit)
+        self.assertEqual(limit.record(5.0), 'latency')
+        self.assertEqual(limit.limit, 4)
+
+    async def test_limit_recovers_only_while_it_is_used_up(self):
+        limit = AIMDLimit(2, 1, 3, cooldown=0)
+        limit.record(0.1)
+        self.assertEqual(limit.limit, 2)
+        async with limit.slot(), limit.slot():
+            for _ in range(4):
+                limit.record(0.1)
+        self.assertEqual(limit.limit, 3)
+
+    async def test_limit_stays_within_its_bounds(self):
+        limit = AIMDLimit(2, 1, 4, cooldown=0)
+        for _ in range(5):
+            limit.record(0.1, rate_limited=True)
+        self.assertEqual(limit.limit, 1)
+        limit.in_flight = 4
+        for _ in range(50):
+            limit.record(0.1)
+        self.assertEqual(limit.limit, 4)
+
+
+class SchedulerLimitTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.scheduler = NicknameScheduler(8, 0, max_concurrency=16, global_concurrency=16, global_max_concurrency=50)
+        self.addCleanup(self.scheduler.close)
+        self.limit = self.scheduler.guild_limit(GUILD_ID)
+        self.rate_limits = self.scheduler.rate_limits
+        for limit in (self.limit, self.scheduler.global_limit):
+            limit.cooldown = 0
+            for _ in range(LATENCY_WARMUP):
+                limit.record(0.01)
+
+    def adapt(self, latency: float):
+        self.scheduler._adapt_limits(GUILD_ID, self.limit, time.monotonic() - latency)
+
+    async def test_latency_of_an_edit_that_waited_for_the_bucket_is_ignored(self):
+        # Another edit exhausted the bucket while this one was in flight
+        self.rate_limits.observe(GUILD_ID, 200, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset-After': '1'})
+        self.adapt(1.0)
+        self.assertEqual(self.limit.limit, 8)
+        self.assertEqual(self.scheduler.global_limit.limit, 16)
+
+    async def test_guild_rate_limit_cuts_only_the_guild_limit(self):
+        with self.assertLogs('utils.rate_limits', 'WARNING'):
+            self.rate_limits.observe(GUILD_ID, 429, {'Retry-After': '1'})
+        self.adapt(1.0)
+        self.assertEqual(self.limit.limit, 4)
+        self.assertEqual(self.scheduler.global_limit.limit, 16)
+
+    async def test_latency_spike_without_contention_cuts_both_limits(self):
+        self.adapt(1.0)
+        self.assertEqual(self.limit.limit, 4)
+        self.assertEqual(self.scheduler.global_limit.limit, 8)
+
+    async def test_guild_limit_never_exceeds_the_global_limit(self):
+        self.scheduler.global_limit.limit = 2
+        self.limit.in_flight = 16
+        for _ in range(50):
+            self.adapt(0.01)
+        self.assertLessEqual(self.limit.limit, self.scheduler.global_limit.limit)
+        self.assertEqual(self.scheduler.guild_limit(GUILD_ID + 1).limit, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import tempfile
+import unittest
+from unittest import mock
+
+import config
+from utils import storage
+from utils.rank_index import RankIndex
+from utils.rank_manager import RankManager
+
+from benchmarks.fakes import ApiCalls, FakeGuild
+
+MEMBERS = 30
+
+
+class AuditTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for patch in (
+            mock.patch.object(storage, 'DATA_DIR', directory.name),
+            mock.patch.object(config, 'RANK_STORAGE', 'json'),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.guild = FakeGuild(1, MEMBERS, ApiCalls())
+        self.manager = RankManager()
+        self.addAsyncCleanup(self.manager.close)
+        self.state = self.manager.get_state(self.guild.id)
+        self.journal = self.manager.storage.journal
+
+    def audit_records(self):
+        return [record for record in self.journal.pending if record['op'] == 'audit']
+
+    async def test_clean_slices_do_not_journal_the_cursor(self):
+        await self.manager.audit_next_slice(self.guild, 10)
+        await self.manager.audit_next_slice(self.guild, 10)
+        self.assertEqual(self.state.audit_cursor, 20)
+        self.assertEqual(self.audit_records(), [])
+
+        # Completing the pass resets the cursor to the 0 already saved
+        await self.manager.audit_next_slice(self.guild, 10)
+        self.assertEqual(self.state.audit_cursor, 0)
+        self.assertEqual(self.audit_records(), [])
+        self.assertEqual(self.state.saved_audit_cursor, 0)
+
+    async def test_cursor_is_saved_with_the_next_change(self):
+        await self.manager.audit_next_slice(self.guild, 10)
+        self.manager.record(self.state, {'op': 'fingerprint', 'fingerprint': 'abc'})
+        self.assertEqual([record['audit_cursor'] for record in self.audit_records()], [10])
+
+    async def test_slice_with_drift_saves_the_cursor(self):
+        self.state.user_ranks = RankIndex({'5': 1})
+        await self.manager.audit_next_slice(self.guild, 10)
+        self.assertEqual([record['audit_cursor'] for record in self.audit_records()], [10])
+
+
+if __name__ == '__main__':
+    unittest.main()
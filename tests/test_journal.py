@@ -0,0 +1,140 @@
+import json
+import os
+import tempfile
+import unittest
+
+from utils.guild_state import GuildRankState
+from utils.journal import RankJournal
+from utils.storage import JsonRankStorage
+
+GUILD_ID = 42
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.data_file = os.path.join(self.directory.name, 'ranks.json')
+        self.journal_file = os.path.join(self.directory.name, 'ranks.journal')
+
+    def open_storage(self, compact_threshold: int = 1000) -> JsonRankStorage:
+        return JsonRankStorage(self.data_file, self.journal_file, compact_threshold)
+
+    def apply(self, storage: JsonRankStorage, guilds: dict, record: dict):
+        """Applies an operation in memory and journals it, like RankManager does."""
+        state = guilds.setdefault(GUILD_ID, GuildRankState(GUILD_ID))
+        state.apply(record)
+        storage.record({**record, 'guild': str(GUILD_ID)})
+
+    def save(self, storage: JsonRankStorage, guilds: dict) -> str:
+        payload = storage.prepare_save(guilds)
+        storage.write_save(payload)
+        return payload[0]
+
+    def test_replays_every_operation(self):
+        storage = self.open_storage()
+        guilds = {}
+        for record in (
+            {'op': 'set', 'member': '1', 'rank': 1},
+            {'op': 'set', 'member': '2', 'rank': 1},
+            {'op': 'set', 'member': '3', 'rank': 5},
+            {'op': 'remove', 'member': '2'},
+            {'op': 'fill', 'ranks': {'3': 2}},
+            {'op': 'channel', 'rank_channel_id': 7},
+            {'op': 'messages', 'rank_message_ids': [8, 9]},
+            {'op': 'audit', 'audit_cursor': 10},
+            {'op': 'fingerprint', 'fingerprint': 'abc'},
+        ):
+            self.apply(storage, guilds, record)
+        self.assertEqual(self.save(storage, guilds), 'append')
+
+        loaded, legacy_section = self.open_storage().load()
+        self.assertIsNone(legacy_section)
+        state = loaded[GUILD_ID]
+        self.assertEqual(state.user_ranks.to_dict(), {'1': 1, '3': 2})
+        self.assertEqual(state.rank_channel_id, 7)
+        self.assertEqual(state.rank_message_ids, [8, 9])
+        self.assertEqual(state.audit_cursor, 10)
+        self.assertEqual(state.fingerprint, 'abc')
+
+    def test_compaction_replays_only_records_after_the_snapshot(self):
+        storage = self.open_storage(compact_threshold=3)
+        guilds = {}
+        for member_id in ('1', '2', '3'):
+            self.apply(storage, guilds, {'op': 'set', 'member': member_id, 'rank': 1})
+        self.assertEqual(self.save(storage, guilds), 'snapshot')
+        self.assertEqual(os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0, 0)
+        with open(self.data_file) as f:
+            self.assertEqual(json.load(f)['journal_seq'], 3)
+
+        self.apply(storage, guilds, {'op': 'set', 'member': '1', 'rank': 1})
+        self.assertEqual(self.save(storage, guilds), 'append')
+
+        reopened = self.open_storage(compact_threshold=3)
+        loaded, _ = reopened.load()
+        self.assertEqual(loaded[GUILD_ID].user_ranks.to_dict(), guilds[GUILD_ID].user_ranks.to_dict())
+        self.assertEqual(reopened.journal.seq, 4)
+        self.assertEqual(reopened.journal.records_since_snapshot, 1)
+
+    def test_records_already_in_the_snapshot_are_skipped(self):
+        # A crash between writing the snapshot and truncating the journal leaves both on disk
+        storage = self.open_storage(compact_threshold=2)
+        guilds = {}
+        self.apply(storage, guilds, {'op': 'set', 'member': '1', 'rank': 1})
+        self.apply(storage, guilds, {'op': 'set', 'member': '2', 'rank': 1})
+        records = list(storage.journal.pending)
+        self.save(storage, guilds)
+        storage.journal.write_records(records)
+
+        loaded, _ = self.open_storage().load()
+        self.assertEqual(loaded[GUILD_ID].user_ranks.to_dict(), {'2': 1, '1': 2})
+
+    def test_torn_tail_is_cut_off(self):
+        storage = self.open_storage()
+        guilds = {}
+        self.apply(storage, guilds, {'op': 'set', 'member': '1', 'rank': 1})
+        self.apply(storage, guilds, {'op': 'set', 'member': '2', 'rank': 2})
+        self.save(storage, guilds)
+        with open(self.journal_file, 'ab') as f:
+            f.write(b'{"op": "set", "member": "3", "ra')
+        complete_size = os.path.getsize(self.journal_file) - len(b'{"op": "set", "member": "3", "ra')
+
+        restarted = self.open_storage()
+        with self.assertLogs('utils.journal', 'WARNING'):
+            guilds, _ = restarted.load()
+        self.assertEqual(guilds[GUILD_ID].user_ranks.to_dict(), {'1': 1, '2': 2})
+        self.assertEqual(os.path.getsize(self.journal_file), complete_size)
+
+        # The first append after the restart must not be glued to the torn line
+        self.apply(restarted, guilds, {'op': 'set', 'member': '3', 'rank': 1})
+        self.save(restarted, guilds)
+        loaded, _ = self.open_storage().load()
+        self.assertEqual(loaded[GUILD_ID].user_ranks.to_dict(), {'3': 1, '1': 2, '2': 3})
+
+    def test_line_without_end_is_torn_even_if_it_parses(self):
+        journal = RankJournal(self.journal_file, 1000)
+        with open(self.journal_file, 'w') as f:
+            f.write('{"seq": 1, "guild": "42", "op": "audit", "audit_cursor": 1}\n')
+            f.write('{"seq": 2, "guild": "42", "op": "audit", "audit_cursor": 2}')
+        with self.assertLogs('utils.journal', 'WARNING'):
+            self.assertEqual([record['seq'] for record in journal.read(0)], [1])
+        with open(self.journal_file, 'rb') as f:
+            self.assertTrue(f.read().endswith(b'\n'))
+
+    def test_damaged_line_before_the_end_is_skipped(self):
+        journal = RankJournal(self.journal_file, 1000)
+        content = (
+            '{"seq": 1, "guild": "42", "op": "audit", "audit_cursor": 1}\n'
+            '{"seq": 2, "guild": "42", "op": "au\x00\n'
+            '{"seq": 3, "guild": "42", "op": "audit", "audit_cursor": 3}\n'
+        )
+        with open(self.journal_file, 'w') as f:
+            f.write(content)
+        with self.assertLogs('utils.journal', 'ERROR'):
+            self.assertEqual([record['seq'] for record in journal.read(0)], [1, 3])
+        with open(self.journal_file) as f:
+            self.assertEqual(f.read(), content)
+
+
+if __name__ == '__main__':
+    unittest.main()
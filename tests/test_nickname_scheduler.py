@@ -0,0 +1,109 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+import discord
+
+from utils.nickname_scheduler import NicknameScheduler, Priority
+
+from benchmarks.fakes import ApiCalls, FakeGuild, FakeMember
+
+
+class GatedApi(ApiCalls):
+    """Holds every call until `gate` is set and records the nickname edits in the order they land."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.edits: List[Tuple[int, Optional[str]]] = []
+
+
+class RecordingMember(FakeMember):
+    __slots__ = ('error',)
+
+    def __init__(self, member_id: int, guild: FakeGuild):
+        super().__init__(member_id, guild)
+        self.error: Optional[Exception] = None
+
+    async def edit(self, nick: Optional[str] = None):
+        await self.guild.api.gate.wait()
+        await super().edit(nick=nick)
+        if self.error is not None:
+            raise self.error
+        self.guild.api.edits.append((self.id, nick))
+
+
+def http_error(status: int) -> discord.HTTPException:
+    return discord.HTTPException(SimpleNamespace(status=status, reason='Error', headers={}), 'Error')
+
+
+class NicknameSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.api = GatedApi()
+        self.guild = FakeGuild(1, 0, self.api)
+        self.failed: List[int] = []
+        self.scheduler = NicknameScheduler(
+            concurrency=1,
+            max_retries=0,
+            on_failure=lambda member: self.failed.append(member.id),
+        )
+        self.addCleanup(self.scheduler.close)
+
+    def member(self, member_id: int) -> RecordingMember:
+        return RecordingMember(member_id, self.guild)
+
+    async def test_queued_edits_of_a_member_are_coalesced(self):
+        member = self.member(1)
+        first = self.scheduler.submit(member, '[1] one')
+        second = self.scheduler.submit(member, '[2] one')
+        self.assertIs(first, second)
+        self.assertTrue(await first)
+        self.assertEqual(self.api.edits, [(1, '[2] one')])
+        self.assertEqual(self.api.counts['member.edit'], 1)
+
+    async def test_edit_for_a_member_in_flight_waits_for_it(self):
+        member = self.member(1)
+        self.api.gate.clear()
+        first = self.scheduler.submit(member, '[1] one')
+        # Let the worker take the edit and block on the gate
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        second = self.scheduler.submit(member, '[2] one')
+        self.assertIsNot(first, second)
+        self.assertEqual(self.scheduler.queue_depth(), 1)
+        self.api.gate.set()
+        self.assertEqual(await asyncio.gather(first, second), [True, True])
+        self.assertEqual(self.api.edits, [(1, '[1] one'), (1, '[2] one')])
+
+    async def test_interactive_edits_go_before_audit_edits(self):
+        self.api.gate.clear()
+        futures = [self.scheduler.submit(self.member(1), '[1] blocking', Priority.AUDIT)]
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        futures += [self.scheduler.submit(self.member(member_id), 'audit', Priority.AUDIT) for member_id in (2, 3)]
+        futures.append(self.scheduler.submit(self.member(4), 'event', Priority.EVENT))
+        futures.append(self.scheduler.submit(self.member(5), 'command', Priority.INTERACTIVE))
+        # Submitting a queued audit edit again from a command moves it up
+        futures.append(self.scheduler.submit(self.member(3), 'command', Priority.INTERACTIVE))
+        self.api.gate.set()
+        await asyncio.gather(*futures)
+        self.assertEqual([member_id for member_id, _ in self.api.edits], [1, 5, 3, 4, 2])
+
+    async def test_only_transient_failures_are_reported(self):
+        rejected = self.member(1)
+        rejected.error = http_error(400)
+        unavailable = self.member(2)
+        unavailable.error = http_error(503)
+        with self.assertLogs('utils.nickname_scheduler', 'ERROR'):
+            results = await asyncio.gather(
+                self.scheduler.submit(rejected, 'x' * 40),
+                self.scheduler.submit(unavailable, '[1] two'),
+            )
+        self.assertEqual(results, [False, False])
+        self.assertEqual(self.failed, [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import random
+import unittest
+
+from utils.rank_index import RankIndex
+
+
+def baseline_set(ranks: dict, member_id: str, new_rank: int):
+    """The shifts `adjust_ranks` made on a plain dict before the ranks were indexed."""
+    old_rank = ranks.pop(member_id, None)
+    for other, rank in ranks.items():
+        if old_rank is None:
+            if rank >= new_rank:
+                ranks[other] = rank + 1
+        elif new_rank < old_rank and new_rank <= rank < old_rank:
+            ranks[other] = rank + 1
+        elif new_rank > old_rank and old_rank < rank <= new_rank:
+            ranks[other] = rank - 1
+    ranks[member_id] = new_rank
+
+
+def baseline_remove(ranks: dict, member_id: str):
+    old_rank = ranks.pop(member_id, None)
+    if old_rank is None:
+        return
+    for other, rank in ranks.items():
+        if rank > old_rank:
+            ranks[other] = rank - 1
+
+
+def baseline_fill(ranks: dict):
+    ordered = sorted(ranks.items(), key=lambda item: item[1])
+    for position, (member_id, _) in enumerate(ordered, start=1):
+        ranks[member_id] = position
+
+
+class RankIndexTest(unittest.TestCase):
+    def assertMatches(self, index: RankIndex, expected: dict):
+        self.assertEqual(index.to_dict(), expected)
+        self.assertEqual(len(index), len(expected))
+        ranks = [rank for _, rank in index.items()]
+        self.assertEqual(ranks, sorted(ranks))
+
+    def assertChangedWithin(self, index: RankIndex, before: dict, changed: range):
+        positions = {member_id: position for position, (member_id, _) in enumerate(index.items())}
+        for member_id, rank in index.items():
+            if before.get(member_id) != rank:
+                self.assertIn(positions[member_id], changed, f"member {member_id} changed outside {changed}")
+
+    def test_random_operations_match_baseline(self):
+        for seed in range(20):
+            rng = random.Random(seed)
+            expected = {}
+            index = RankIndex()
+            for _ in range(300):
+                before = dict(expected)
+                roll = rng.random()
+                member_id = str(rng.randrange(40))
+                if roll < 0.65:
+                    # Ranks past the end and duplicates of existing ones are both allowed
+                    new_rank = rng.randint(1, len(expected) + 3)
+                    baseline_set(expected, member_id, new_rank)
+                    changed = index.set(member_id, new_rank)
+                    self.assertChangedWithin(index, before, changed)
+                elif roll < 0.9:
+                    baseline_remove(expected, member_id)
+                    changed = index.remove(member_id)
+                    if member_id in before:
+                        self.assertChangedWithin(index, before, changed)
+                    else:
+                        self.assertIsNone(changed)
+                else:
+                    baseline_fill(expected)
+                    changed = index.compact()
+                    self.assertEqual(set(changed), {m for m, rank in expected.items() if before[m] != rank})
+                self.assertMatches(index, expected)
+
+    def test_setting_same_rank_changes_nothing(self):
+        index = RankIndex({'1': 1, '2': 2, '3': 3})
+        self.assertEqual(len(index.set('2', 2)), 0)
+        self.assertEqual(index.to_dict(), {'1': 1, '2': 2, '3': 3})
+
+    def test_build_from_dict_matches_items(self):
+        ranks = {str(member_id): random.Random(member_id).randint(1, 50) for member_id in range(200)}
+        index = RankIndex(ranks)
+        self.assertMatches(index, ranks)
+        for position, (member_id, _) in enumerate(index.items()):
+            self.assertEqual(index.position(member_id), position)
+        self.assertEqual(list(index.slice(10, 20)), list(index.items())[10:20])
+
+
+if __name__ == '__main__':
+    unittest.main()
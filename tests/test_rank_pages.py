@@ -0,0 +1,109 @@
+import tempfile
+import unittest
+from unittest import mock
+
+import config
+from utils import storage
+from utils.rank_index import RankIndex
+from utils.rank_manager import RankManager
+
+from benchmarks.fakes import ApiCalls, FakeGuild
+
+MEMBERS = 300
+# Members in the guild but not ranked yet, enough to fill more pages
+UNRANKED = 150
+
+
+class RankPagesTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for patch in (
+            mock.patch.object(storage, 'DATA_DIR', directory.name),
+            mock.patch.object(config, 'RANK_STORAGE', 'json'),
+            mock.patch.object(config, 'RANK_CHANNEL_NAME', 'ranks'),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.api = ApiCalls()
+        self.guild = FakeGuild(1, MEMBERS + UNRANKED, self.api)
+        self.manager = RankManager()
+        self.addAsyncCleanup(self.manager.close)
+        self.state = self.manager.get_state(self.guild.id)
+        self.state.user_ranks = RankIndex({str(member_id): member_id for member_id in range(1, MEMBERS + 1)})
+        await self.manager.update_rank_message(self.guild)
+        self.channel = self.guild.text_channels[0]
+
+    def channel_pages(self):
+        return [message.content for message in self.channel.messages.values()]
+
+    def assertInOrder(self):
+        pages = self.channel_pages()
+        self.assertEqual([message_id for message_id in self.channel.messages], self.state.rank_message_ids)
+        first_ranks = [int(page.split('\n')[1].split(':')[0][len('Rank '):]) for page in pages]
+        self.assertEqual(first_ranks, sorted(first_ranks))
+        self.assertEqual(first_ranks[0], 1)
+
+    async def test_list_spans_several_pages(self):
+        self.assertGreaterEqual(len(self.state.rank_message_ids), 3)
+        self.assertInOrder()
+
+    async def test_missing_middle_page_is_reposted_in_order(self):
+        page_count = len(self.state.rank_message_ids)
+        del self.channel.messages[self.state.rank_message_ids[1]]
+        # Change every page, so the missing one is found by its failed edit
+        self.state.user_ranks.set('1', MEMBERS)
+        await self.manager.update_rank_message(self.guild)
+
+        self.assertEqual(len(self.channel.messages), page_count)
+        self.assertInOrder()
+        self.assertIsNotNone(self.state.rendered_hash)
+
+    async def test_deleted_page_is_reposted_in_order(self):
+        page_count = len(self.state.rank_message_ids)
+        deleted = self.state.rank_message_ids[1]
+        del self.channel.messages[deleted]
+        self.assertTrue(self.manager.forget_rank_message(self.guild, deleted))
+        self.assertEqual(len(self.state.rank_message_ids), 1)
+
+        # Nothing on the list changed, so only the deletion triggers the render
+        await self.manager.renderer.tasks[self.guild.id]
+        self.assertEqual(len(self.channel.messages), page_count)
+        self.assertNotIn(deleted, self.state.rank_message_ids)
+        self.assertInOrder()
+
+    async def test_unchanged_list_is_not_posted_again(self):
+        self.api.reset()
+        await self.manager.update_rank_message(self.guild)
+        self.assertEqual(sum(self.api.counts.values()), 0)
+
+        # Only the page whose text changed is edited
+        self.state.user_ranks.set(str(MEMBERS), MEMBERS)
+        self.state.user_ranks.set(str(MEMBERS - 1), MEMBERS)
+        await self.manager.update_rank_message(self.guild)
+        self.assertEqual(dict(self.api.counts), {'message.edit': 1})
+
+    async def test_partially_posted_list_is_retried(self):
+        pages = self.channel_pages()
+
+        async def failing_send(content):
+            raise RuntimeError("send failed")
+        # The list grows by a page whose message cannot be sent
+        for member_id in range(MEMBERS + 1, MEMBERS + UNRANKED + 1):
+            self.state.user_ranks.set(str(member_id), member_id)
+        send = self.channel.send
+        self.channel.send = failing_send
+        with self.assertLogs('utils.rank_manager', 'ERROR'):
+            await self.manager.update_rank_message(self.guild)
+        self.assertIsNone(self.state.rendered_hash)
+        self.assertEqual(len(self.channel.messages), len(pages))
+
+        self.channel.send = send
+        await self.manager.update_rank_message(self.guild)
+        self.assertIsNotNone(self.state.rendered_hash)
+        self.assertGreater(len(self.channel.messages), len(pages))
+        self.assertInOrder()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from utils.render_scheduler import RenderScheduler
+
+INTERVAL = 0.05
+
+
+class RenderSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.guild = SimpleNamespace(id=1, name='guild')
+        self.renders = []
+        self.release = asyncio.Event()
+        self.release.set()
+        self.scheduler = RenderScheduler(self.render, INTERVAL)
+        self.addCleanup(self.scheduler.close)
+
+    async def render(self, guild):
+        self.renders.append(asyncio.get_running_loop().time())
+        await self.release.wait()
+
+    async def settle(self):
+        while self.scheduler.tasks:
+            await asyncio.gather(*self.scheduler.tasks.values())
+
+    async def test_burst_of_changes_renders_once(self):
+        for _ in range(10):
+            self.scheduler.mark_dirty(self.guild)
+        await self.settle()
+        self.assertEqual(len(self.renders), 1)
+
+    async def test_change_during_a_render_renders_again_after_the_interval(self):
+        self.release.clear()
+        self.scheduler.mark_dirty(self.guild)
+        await asyncio.sleep(0)
+        self.assertEqual(len(self.renders), 1)
+        self.scheduler.mark_dirty(self.guild)
+        self.scheduler.mark_dirty(self.guild)
+        self.release.set()
+        await self.settle()
+        self.assertEqual(len(self.renders), 2)
+        self.assertGreaterEqual(self.renders[1] - self.renders[0], INTERVAL * 0.9)
+
+    async def test_failed_render_does_not_stop_later_ones(self):
+        async def failing(guild):
+            self.renders.append(None)
+            raise RuntimeError("render failed")
+        self.scheduler.render = failing
+        with self.assertLogs('utils.render_scheduler', 'ERROR'):
+            self.scheduler.mark_dirty(self.guild)
+            await self.settle()
+        self.scheduler.mark_dirty(self.guild)
+        with self.assertLogs('utils.render_scheduler', 'ERROR'):
+            await self.settle()
+        self.assertEqual(len(self.renders), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
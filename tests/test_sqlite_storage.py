@@ -0,0 +1,87 @@
+import os
+import random
+import tempfile
+import unittest
+
+from utils.guild_state import GuildRankState
+from utils.sqlite_storage import SqliteRankStorage
+
+GUILD_ID = 42
+
+
+class SqliteStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'ranks.db')
+
+    def open_storage(self) -> SqliteRankStorage:
+        storage = SqliteRankStorage(self.path)
+        self.addCleanup(storage.close)
+        return storage
+
+    def save(self, storage: SqliteRankStorage, guilds: dict):
+        storage.write_save(storage.prepare_save(guilds))
+
+    def test_operations_match_the_in_memory_state(self):
+        storage = self.open_storage()
+        state = GuildRankState(GUILD_ID)
+        guilds = {GUILD_ID: state}
+        rng = random.Random(0)
+        for _ in range(20):
+            for _ in range(25):
+                member_id = str(rng.randrange(30))
+                roll = rng.random()
+                if roll < 0.7:
+                    record = {'op': 'set', 'member': member_id, 'rank': rng.randint(1, len(state.user_ranks) + 2)}
+                elif roll < 0.95:
+                    record = {'op': 'remove', 'member': member_id}
+                else:
+                    ordered = [member for member, _ in state.user_ranks.items()]
+                    record = {'op': 'fill', 'ranks': {member: rank for rank, member in enumerate(ordered, start=1)}}
+                state.apply(record)
+                storage.record({**record, 'guild': str(GUILD_ID)})
+            # Saving in batches runs several operations in one transaction, like the saver does
+            self.save(storage, guilds)
+            loaded, _ = self.open_storage().load()
+            self.assertEqual(loaded[GUILD_ID].user_ranks.to_dict(), state.user_ranks.to_dict())
+
+    def test_guild_settings_round_trip(self):
+        storage = self.open_storage()
+        state = GuildRankState(GUILD_ID)
+        for record in (
+            {'op': 'channel', 'rank_channel_id': 7},
+            {'op': 'messages', 'rank_message_ids': [8, 9]},
+            {'op': 'audit', 'audit_cursor': 10},
+            {'op': 'fingerprint', 'fingerprint': 'abc'},
+        ):
+            state.apply(record)
+            storage.record({**record, 'guild': str(GUILD_ID)})
+        self.save(storage, {GUILD_ID: state})
+
+        loaded, _ = self.open_storage().load()
+        self.assertEqual(loaded[GUILD_ID].rank_channel_id, 7)
+        self.assertEqual(loaded[GUILD_ID].rank_message_ids, [8, 9])
+        self.assertEqual(loaded[GUILD_ID].audit_cursor, 10)
+        self.assertEqual(loaded[GUILD_ID].fingerprint, 'abc')
+
+    def test_snapshot_rewrites_the_guild(self):
+        storage = self.open_storage()
+        state = GuildRankState(GUILD_ID)
+        state.apply({'op': 'set', 'member': '1', 'rank': 1})
+        storage.record({'op': 'set', 'member': '1', 'rank': 1, 'guild': str(GUILD_ID)})
+        self.save(storage, {GUILD_ID: state})
+
+        # A bulk change is not journaled, only announced with a snapshot request
+        state.user_ranks.remove('1')
+        for member_id, rank in (('2', 1), ('3', 2)):
+            state.user_ranks.set(member_id, rank)
+        storage.request_snapshot(GUILD_ID)
+        self.save(storage, {GUILD_ID: state})
+
+        loaded, _ = self.open_storage().load()
+        self.assertEqual(loaded[GUILD_ID].user_ranks.to_dict(), {'2': 1, '3': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
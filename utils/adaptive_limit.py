@@ -0,0 +1,92 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+# Weight of a new sample in the moving average of request latency
+LATENCY_SMOOTHING = 0.1
+# Samples needed before latency spikes are acted on
+LATENCY_WARMUP = 10
+
+
+class AIMDLimit:
+    """
+    A concurrency limit that adapts with additive increase, multiplicative decrease.
+
+    Each request that comes back clean raises the limit by 1 / limit, so it grows by
+    about one per round of `limit` requests. A 429, or a request slower than
+    `latency_factor` times the moving average, cuts it by `backoff`, at most once per
+    `cooldown` seconds so a burst of failures from one round only counts once.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        backoff: float = 0.5,
+        latency_factor: float = 3.0,
+        cooldown: float = 1.0,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.backoff = backoff
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.average_latency: Optional[float] = None
+        self.samples = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Waits until fewer than `limit` requests are in flight, and holds a place among them."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            async with self._condition:
+                self._condition.notify_all()
+
+    def is_latency_spike(self, latency: float) -> bool:
+        return (
+            self.average_latency is not None
+            and self.samples >= LATENCY_WARMUP
+            and latency > self.average_latency * self.latency_factor
+        )
+
+    def record(self, latency: float, rate_limited: bool = False) -> Optional[str]:
+        """
+        Feeds back a finished request, from inside its slot. Returns why the limit was cut,
+        'rate_limit' or 'latency', or None if it was raised or left alone.
+        """
+        if rate_limited:
+            # The latency includes the wait for the bucket to reset, so it is not sampled
+            reason = 'rate_limit'
+        else:
+            reason = 'latency' if self.is_latency_spike(latency) else None
+            self.samples += 1
+            if self.average_latency is None:
+                self.average_latency = latency
+            else:
+                self.average_latency += (latency - self.average_latency) * LATENCY_SMOOTHING
+        if reason is None:
+            # Only a limit that is being used up has shown that it could be higher
+            if self.in_flight >= int(self.limit):
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            return None
+        return reason if self.decrease() else None
+
+    def decrease(self) -> bool:
+        """Cuts the limit, unless it was cut less than `cooldown` seconds ago. Returns True if it was."""
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return False
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.backoff)
+        return True
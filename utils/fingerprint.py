@@ -0,0 +1,37 @@
+import hashlib
+from typing import Dict, Optional
+
+# Entry hashes are summed modulo 2**64, so the result does not depend on member order
+MASK = (1 << 64) - 1
+
+
+def entry_hash(member_id: int, value) -> int:
+    """Returns a 64-bit hash of one (member id, nickname or rank) pair."""
+    digest = hashlib.blake2b(f"{member_id}\0{value}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class MemberFingerprint:
+    """
+    Order-independent fingerprint of a guild's (member id, nickname) pairs,
+    accumulated while members are streamed in.
+    """
+
+    def __init__(self):
+        self.value = 0
+        self.count = 0
+
+    def add(self, member_id: int, nickname: Optional[str]):
+        self.value = (self.value + entry_hash(member_id, nickname)) & MASK
+        self.count += 1
+
+    def combine(self, user_ranks: Dict[str, int]) -> str:
+        """
+        Returns the fingerprint of these members together with the guild's ranks.
+        Whether nicknames match ranks depends only on both, so an equal fingerprint
+        means an equally consistent guild.
+        """
+        ranks = 0
+        for member_id, rank in user_ranks.items():
+            ranks = (ranks + entry_hash(int(member_id), rank)) & MASK
+        return f"{self.count:x}-{self.value:016x}-{ranks:016x}"
@@ -0,0 +1,111 @@
+import asyncio
+from typing import List, Optional, Tuple, Union
+
+from utils.rank_index import RankIndex
+
+
+class GuildRankState:
+    """Rank namespace of a single guild: its ladder, rank list pages and lock."""
+
+    def __init__(
+        self,
+        guild_id: int,
+        user_ranks: Optional[RankIndex] = None,
+        rank_message_ids: Optional[List[int]] = None,
+        rank_channel_id: Optional[int] = None,
+        audit_cursor: int = 0,
+        fingerprint: Optional[str] = None,
+    ):
+        self.guild_id = guild_id
+        self.user_ranks = user_ranks if user_ranks is not None else RankIndex()
+        self.rank_channel_id = rank_channel_id
+        # Id of the last member checked by the rolling audit; 0 starts a new pass
+        self.audit_cursor = audit_cursor
+        # Cursor as last persisted; it is saved with the next real change rather than on every audit tick
+        self.saved_audit_cursor = audit_cursor
+        # Fingerprint of the last nicknames and ranks known to match, to skip enforcement on startup
+        self.fingerprint = fingerprint
+        # One message per page of the rank list, in channel order
+        self.rank_message_ids: List[int] = rank_message_ids or []
+        # Text last posted on each page; not persisted, so every page is edited once after a restart
+        self.rendered_pages: List[Optional[str]] = []
+        self.rendered_hash: Optional[str] = None
+        # Pages that followed a deleted page; deleted by the next render, which posts them again in order
+        self.stale_message_ids: List[int] = []
+        self.lock = asyncio.Lock()
+        self.render_lock = asyncio.Lock()
+        # Bumped on every change so the persisted section is only re-serialized when needed
+        self.version = 0
+        self._section: Optional[str] = None
+        self._section_version = -1
+
+    @classmethod
+    def from_section(cls, guild_id: int, section: dict) -> 'GuildRankState':
+        """Creates a guild state from its persisted section of 'ranks.json'."""
+        rank_message_ids = section.get('rank_message_ids')
+        if rank_message_ids is None:
+            # Sections written before the rank list was paginated hold a single message id
+            rank_message_ids = [section['rank_message_id']] if section.get('rank_message_id') else []
+        return cls(
+            guild_id,
+            RankIndex(section.get('user_ranks', {})),
+            rank_message_ids,
+            section.get('rank_channel_id'),
+            section.get('audit_cursor', 0),
+            section.get('fingerprint'),
+        )
+
+    def apply(self, record: dict) -> bool:
+        """Applies one journaled operation to this state. Returns False for unknown operations."""
+        op = record['op']
+        if op == 'set':
+            self.user_ranks.set(record['member'], record['rank'])
+        elif op == 'remove':
+            self.user_ranks.remove(record['member'])
+        elif op == 'fill':
+            self.user_ranks = RankIndex({**self.user_ranks.to_dict(), **record['ranks']})
+        elif op == 'audit':
+            self.audit_cursor = self.saved_audit_cursor = record['audit_cursor']
+        elif op == 'fingerprint':
+            self.fingerprint = record['fingerprint']
+        elif op == 'channel':
+            self.rank_channel_id = record['rank_channel_id']
+        elif op == 'messages':
+            self.rank_message_ids = list(record['rank_message_ids'])
+        elif op == 'message':
+            # Journal records written before the rank list was paginated
+            self.rank_message_ids = [record['rank_message_id']] if record['rank_message_id'] else []
+        else:
+            return False
+        self.touch()
+        return True
+
+    def forget_rendered(self):
+        """Forgets what was posted, so the next render checks every page again."""
+        self.rendered_pages = []
+        self.rendered_hash = None
+
+    def touch(self):
+        """Marks the state as changed."""
+        self.version += 1
+
+    def snapshot_section(self) -> Tuple[int, Union[str, dict]]:
+        """
+        Returns the state version and either the cached JSON text of this guild's section
+        or, if it changed since it was last serialized, a copy of it to serialize.
+        """
+        if self._section is not None and self._section_version == self.version:
+            return self.version, self._section
+        return self.version, {
+            'user_ranks': self.user_ranks.to_dict(),
+            'rank_message_ids': list(self.rank_message_ids),
+            'rank_channel_id': self.rank_channel_id,
+            'audit_cursor': self.audit_cursor,
+            'fingerprint': self.fingerprint
+        }
+
+    def cache_section(self, version: int, text: str):
+        """Remembers the serialized section for `version` so unchanged guilds are not re-serialized."""
+        if version == self.version:
+            self._section = text
+            self._section_version = version
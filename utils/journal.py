@@ -0,0 +1,104 @@
+import json
+import logging
+import os
+from typing import Iterator, List
+
+logger = logging.getLogger(__name__)
+
+
+class RankJournal:
+    """
+    Append-only log of rank operations, stored as one JSON record per line.
+
+    Every record gets an increasing sequence number. A snapshot stores the sequence
+    number it includes, so on startup only the records after it are replayed, and a
+    crash between writing a snapshot and truncating the journal is harmless.
+    """
+
+    def __init__(self, path: str, compact_threshold: int):
+        self.path = path
+        self.compact_threshold = compact_threshold
+        self.seq = 0
+        self.pending: List[dict] = []
+        self.records_since_snapshot = 0
+        self.compaction_requested = False
+
+    def append(self, record: dict):
+        """Queues a record to be written with the next flush."""
+        self.seq += 1
+        record['seq'] = self.seq
+        self.pending.append(record)
+        self.records_since_snapshot += 1
+
+    def needs_compaction(self) -> bool:
+        """Returns True once the journal should be folded into a fresh snapshot."""
+        return self.compaction_requested or self.records_since_snapshot >= self.compact_threshold
+
+    def request_compaction(self):
+        """Forces the next flush to write a snapshot, e.g. after a bulk change that is not journaled."""
+        self.compaction_requested = True
+
+    def drain(self) -> List[dict]:
+        """Takes the records queued since the last flush."""
+        records, self.pending = self.pending, []
+        return records
+
+    def compacted(self):
+        """Resets the compaction counters once a snapshot including every record has been taken."""
+        self.records_since_snapshot = 0
+        self.compaction_requested = False
+
+    def write_records(self, records: List[dict]) -> int:
+        """Appends records to the journal file and returns the bytes written. Runs in a worker thread."""
+        if not records:
+            return 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = ''.join(json.dumps(record) + '\n' for record in records).encode()
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        logger.debug(f"Appended {len(records)} records to the rank journal")
+        return len(data)
+
+    def truncate(self):
+        """Empties the journal file after a snapshot made it redundant. Runs in a worker thread."""
+        if os.path.exists(self.path):
+            with open(self.path, 'w') as f:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def read(self, after_seq: int) -> Iterator[dict]:
+        """
+        Yields the records newer than `after_seq`. A torn final line is cut off the file,
+        so the next append starts on a line of its own; a damaged line before the end was
+        written in full once, so it is skipped and the records after it are still replayed.
+        """
+        if not os.path.exists(self.path):
+            return
+        torn_at = None
+        with open(self.path, 'rb') as f:
+            offset = 0
+            line = f.readline()
+            while line:
+                next_line = f.readline()
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("missing line end")
+                    record = json.loads(line)
+                except ValueError:
+                    if not next_line:
+                        logger.warning("Ignoring incomplete record at the end of the rank journal")
+                        torn_at = offset
+                        break
+                    logger.error(f"Skipping damaged record at byte {offset} of the rank journal")
+                else:
+                    if record.get('seq', 0) > after_seq:
+                        yield record
+                offset += len(line)
+                line = next_line
+        if torn_at is not None:
+            with open(self.path, 'r+b') as f:
+                f.truncate(torn_at)
+                f.flush()
+                os.fsync(f.fileno())
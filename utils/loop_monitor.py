@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop runs a heartbeat that sleeps `interval` seconds.
+    A watchdog thread checks the heartbeat; when it is more than `threshold` seconds overdue,
+    the loop is blocked, and the thread logs the stack the loop thread is stuck in.
+    """
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self.loop_thread_id: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+        # Written by the heartbeat, read by the watchdog
+        self.last_beat = time.monotonic()
+        self.beats = 0
+
+    def start(self):
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stopped.clear()
+        self.task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self.thread = threading.Thread(target=self._watchdog, name='loop-watchdog', daemon=True)
+        self.thread.start()
+        logger.info(f"Monitoring event loop lag every {self.interval}s, reporting stalls over {self.threshold}s")
+
+    async def stop(self):
+        self.stopped.set()
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.thread is not None:
+            await asyncio.to_thread(self.thread.join)
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            metrics.LOOP_LAG.observe(lag)
+            if lag >= self.threshold:
+                logger.warning(f"Event loop was blocked for {lag:.3f}s")
+            self.last_beat = now
+            self.beats += 1
+
+    def _watchdog(self):
+        reported_beat = -1
+        while not self.stopped.wait(min(self.interval, self.threshold) / 2):
+            beat = self.beats
+            overdue = time.monotonic() - self.last_beat - self.interval
+            if overdue < self.threshold or beat == reported_beat:
+                continue
+            # Only the first check of a stall captures the stack
+            reported_beat = beat
+            metrics.LOOP_STALLS.inc()
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            stack = ''.join(traceback.format_stack(frame))
+            logger.warning(f"Event loop blocked for over {overdue:.3f}s, in:\n{stack}")
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+# Discord accepts at most 100 user ids per member chunk request
+QUERY_BATCH_SIZE = 100
+
+
+class MemberResolver:
+    """
+    Resolves member ids to guild members in bulk.
+
+    Ids missing from the cache are requested through gateway member chunk requests,
+    100 at a time, instead of one HTTP request per id. Ids that did not come back are
+    remembered as departed for `negative_ttl` seconds.
+    """
+
+    def __init__(self, negative_ttl: float):
+        self.negative_ttl = negative_ttl
+        # (guild id, member id) -> monotonic expiry
+        self.not_found: Dict[Tuple[int, int], float] = {}
+
+    def forget(self, guild_id: int, member_id: int):
+        """Drops a departed entry, e.g. when the member joins again."""
+        self.not_found.pop((guild_id, member_id), None)
+
+    def _known_missing(self, guild_id: int, member_id: int, now: float) -> bool:
+        expiry = self.not_found.get((guild_id, member_id))
+        if expiry is None:
+            return False
+        if expiry <= now:
+            del self.not_found[(guild_id, member_id)]
+            return False
+        return True
+
+    def cached(self, guild: discord.Guild, member_ids: Iterable[int]) -> Tuple[Dict[int, discord.Member], List[int]]:
+        """
+        Returns the members found in the cache, keyed by id, and the ids that have to be
+        requested, leaving out those known to have left.
+        """
+        now = time.monotonic()
+        found: Dict[int, discord.Member] = {}
+        missing: List[int] = []
+        for member_id in member_ids:
+            member = guild.get_member(member_id)
+            if member is not None:
+                found[member_id] = member
+            elif not self._known_missing(guild.id, member_id, now):
+                missing.append(member_id)
+        return found, missing
+
+    async def resolve(self, guild: discord.Guild, member_ids: Iterable[int]) -> Dict[int, discord.Member]:
+        """Returns the members that are still in the guild, keyed by id."""
+        found, missing = self.cached(guild, member_ids)
+
+        for start in range(0, len(missing), QUERY_BATCH_SIZE):
+            batch = missing[start:start + QUERY_BATCH_SIZE]
+            try:
+                members = await guild.query_members(user_ids=batch, limit=len(batch), cache=True)
+            except (discord.ClientException, asyncio.TimeoutError):
+                logger.warning(f"Member chunk request failed in guild '{guild.name}', fetching {len(batch)} members one by one")
+                members = await self._fetch_each(guild, batch)
+            for member in members:
+                found[member.id] = member
+
+            expiry = time.monotonic() + self.negative_ttl
+            departed = [member_id for member_id in batch if member_id not in found]
+            for member_id in departed:
+                self.not_found[(guild.id, member_id)] = expiry
+                logger.debug(f"Member with ID {member_id} not found.")
+            if departed:
+                logger.warning(f"{len(departed)} ranked members not found in guild '{guild.name}'")
+        return found
+
+    @staticmethod
+    async def _fetch_each(guild: discord.Guild, member_ids: List[int]) -> List[discord.Member]:
+        members = []
+        for member_id in member_ids:
+            try:
+                members.append(await guild.fetch_member(member_id))
+            except discord.NotFound:
+                pass
+        return members
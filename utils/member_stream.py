@@ -0,0 +1,46 @@
+import asyncio
+import logging
+from typing import AsyncIterable, AsyncIterator, Iterable, Union
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+# Members given either as a list or as a stream that yields them as they arrive
+MemberSource = Union[Iterable[discord.Member], AsyncIterable[discord.Member]]
+
+# Members processed between two yields to the event loop
+YIELD_EVERY = 1000
+
+
+async def iterate_members(members: MemberSource) -> AsyncIterator[discord.Member]:
+    """
+    Iterates over a list or a stream of members.
+    Yields to the event loop every YIELD_EVERY members, so commands and gateway events
+    get through during long passes.
+    """
+    if isinstance(members, AsyncIterable):
+        async for member in members:
+            yield member
+        return
+    for count, member in enumerate(members, start=1):
+        if count % YIELD_EVERY == 0:
+            await asyncio.sleep(0)
+        yield member
+
+
+async def guild_members(guild: discord.Guild) -> MemberSource:
+    """
+    Returns the members of a guild from the gateway member cache, requesting the guild's
+    member chunks first if they have not been received yet.
+    Falls back to a stream of REST pages when chunking is unavailable, e.g. without the
+    members intent.
+    """
+    try:
+        if not guild.chunked:
+            await guild.chunk()
+        logger.info(f"Loaded {len(guild.members)} members of guild '{guild.name}' from the gateway")
+        return guild.members
+    except (discord.ClientException, asyncio.TimeoutError):
+        logger.warning(f"Member chunking unavailable in guild '{guild.name}', fetching members over HTTP")
+    return guild.fetch_members(limit=None)
@@ -0,0 +1,236 @@
+import logging
+import math
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+class Metric:
+    """A named metric with a fixed set of label names, one series per label value combination."""
+
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Metric '{self.name}' expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, label_values, value in self.samples():
+            names = self.label_names + (('le',) if suffix == '_bucket' else ())
+            lines.append(f"{self.name}{suffix}{_format_labels(names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield '', key, value
+
+
+class Gauge(Metric):
+    """A value that can go up and down, or is read from a callback on every scrape."""
+
+    type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[LabelValues, float] = {}
+        self.callbacks: Dict[LabelValues, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float], **labels):
+        """Reads the value from `function` whenever the metrics are collected."""
+        self.callbacks[self._key(labels)] = function
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield '', key, value
+        for key, function in self.callbacks.items():
+            try:
+                yield '', key, float(function())
+            except Exception:
+                logger.exception(f"Failed to read gauge '{self.name}'")
+
+
+class Histogram(Metric):
+    """Counts observations in cumulative buckets, with their sum and count."""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> (bucket counts, sum)
+        self.values: Dict[LabelValues, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        counts, total = self.values.get(key) or ([0] * len(self.buckets), 0.0)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        self.values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the time spent in the `with` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        for key, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield '_bucket', key + (_format_value(bound),), cumulative
+            yield '_sum', key, total
+            yield '_count', key, cumulative
+
+
+class Registry:
+    """Collects metrics and renders them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+COMMAND_DURATION = REGISTRY.histogram(
+    'rankbot_command_duration_seconds', "Time spent in each phase of a rank command.", ('command', 'phase')
+)
+LOCK_WAIT = REGISTRY.histogram(
+    'rankbot_lock_wait_seconds', "Time spent waiting for a guild's rank lock.", ('operation',)
+)
+NICKNAME_EDITS = REGISTRY.counter(
+    'rankbot_nickname_edits_total', "Nickname edit requests sent to Discord, including retries."
+)
+NICKNAME_EDIT_FAILURES = REGISTRY.counter(
+    'rankbot_nickname_edit_failures_total', "Nickname edits given up on.", ('reason',)
+)
+NICKNAME_QUEUE_DEPTH = REGISTRY.gauge(
+    'rankbot_nickname_edit_queue_depth', "Nickname edits waiting to be sent, by priority lane.", ('lane',)
+)
+NICKNAME_CONCURRENCY_LIMIT = REGISTRY.gauge(
+    'rankbot_nickname_edit_concurrency_limit', "Adaptive limit of parallel nickname edits, per guild id or 'global'.", ('scope',)
+)
+NICKNAME_CONCURRENCY_DECREASES = REGISTRY.counter(
+    'rankbot_nickname_edit_concurrency_decreases_total', "Times a nickname edit concurrency limit was cut.", ('scope', 'reason')
+)
+RATE_LIMITED = REGISTRY.counter(
+    'rankbot_rate_limited_total', "HTTP 429 responses received from Discord.", ('route',)
+)
+RETRY_AFTER = REGISTRY.counter(
+    'rankbot_retry_after_seconds_total', "Sum of the Retry-After delays of 429 responses.", ('route',)
+)
+PERSIST_DURATION = REGISTRY.histogram(
+    'rankbot_persist_duration_seconds', "Time spent writing rank state to storage."
+)
+PERSIST_BYTES = REGISTRY.counter(
+    'rankbot_persist_bytes_total', "Bytes written to the JSON rank storage."
+)
+RENDERS = REGISTRY.counter(
+    'rankbot_rank_list_renders_total', "Rank list renders, by whether any page had to change.", ('outcome',)
+)
+RECONCILE_DRIFT = REGISTRY.gauge(
+    'rankbot_reconcile_drift', "Members whose nickname did not match their rank in the last reconciliation cycle.", ('source',)
+)
+RECONCILE_DRIFT_TOTAL = REGISTRY.counter(
+    'rankbot_reconcile_drift_total', "Members whose nickname did not match their rank, found by reconciliation.", ('source',)
+)
+LOOP_LAG = REGISTRY.histogram(
+    'rankbot_event_loop_lag_seconds', "How late the event loop ran the lag monitor's heartbeat.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+LOOP_STALLS = REGISTRY.counter(
+    'rankbot_event_loop_stalls_total', "Times the event loop was blocked for longer than the lag threshold."
+)
+
+
+async def start_metrics_server(host: str, port: int, registry: Registry = REGISTRY) -> web.AppRunner:
+    """Serves the metrics at http://host:port/metrics. Returns the runner to clean up on shutdown."""
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type='text/plain', headers={'X-Content-Type-Options': 'nosniff'})
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return runner
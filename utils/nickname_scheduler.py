@@ -0,0 +1,367 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from enum import IntEnum
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import discord
+
+from utils import metrics, tracing
+from utils.adaptive_limit import AIMDLimit
+from utils.rate_limits import RateLimitTracker
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Lanes of nickname edits; a lower value is sent first."""
+
+    INTERACTIVE = 0  # members moved by an admin's rank command
+    EVENT = 1  # fixes of nickname changes and joins seen on the gateway
+    AUDIT = 2  # startup enforcement and the rolling audit
+
+
+class PendingEdit:
+    """A nickname edit waiting to be sent, the lane it waits in, and the future its caller awaits."""
+
+    __slots__ = ('member', 'nickname', 'future', 'priority')
+
+    def __init__(self, member: discord.Member, nickname: Optional[str], future: asyncio.Future, priority: Priority):
+        self.member = member
+        self.nickname = nickname
+        self.future = future
+        self.priority = priority
+
+
+class ExpectedNicknames:
+    """
+    Nicknames the bot has just written, kept for a short time so the member update
+    events they cause can be recognised and dropped.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        # (guild id, member id) -> (nickname, monotonic expiry)
+        self.entries: Dict[Tuple[int, int], Tuple[Optional[str], float]] = {}
+        self._next_purge = 0.0
+
+    def add(self, guild_id: int, member_id: int, nickname: Optional[str]):
+        now = time.monotonic()
+        self.entries[(guild_id, member_id)] = (nickname, now + self.ttl)
+        if now >= self._next_purge:
+            # Drop echoes that never arrived, at most once per TTL
+            self.entries = {key: entry for key, entry in self.entries.items() if entry[1] > now}
+            self._next_purge = now + self.ttl
+
+    def discard(self, guild_id: int, member_id: int):
+        self.entries.pop((guild_id, member_id), None)
+
+    def consume(self, guild_id: int, member_id: int, nickname: Optional[str]) -> bool:
+        """Returns True, and forgets the entry, if `nickname` is one the bot is expecting to see."""
+        entry = self.entries.get((guild_id, member_id))
+        if entry is None or entry[0] != nickname:
+            return False
+        del self.entries[(guild_id, member_id)]
+        return entry[1] > time.monotonic()
+
+
+class GuildEditQueue:
+    """
+    Pending nickname edits of one guild in one lane per priority, each keyed by member id
+    in submission order, and the workers draining them.
+
+    With `weights`, lanes are picked by smooth weighted round-robin among those with edits,
+    so lower lanes keep moving at a share of the throughput. Without, a lane is only
+    drained once every higher one is empty.
+    """
+
+    def __init__(self, weights: Optional[Sequence[int]] = None):
+        self.lanes: List['OrderedDict[int, PendingEdit]'] = [OrderedDict() for _ in Priority]
+        self.weights = weights
+        self.credits = [0] * len(Priority)
+        # Edits being sent, and newer edits for the same members held back until those land
+        self.in_flight: Dict[int, PendingEdit] = {}
+        self.deferred: Dict[int, PendingEdit] = {}
+        self.workers = 0
+
+    def __len__(self) -> int:
+        return sum(len(lane) for lane in self.lanes)
+
+    def get(self, member_id: int) -> Optional[PendingEdit]:
+        for lane in self.lanes:
+            edit = lane.get(member_id)
+            if edit is not None:
+                return edit
+        return None
+
+    def push(self, member_id: int, edit: PendingEdit):
+        self.lanes[edit.priority][member_id] = edit
+
+    def promote(self, member_id: int, edit: PendingEdit, priority: Priority):
+        """Moves a queued edit up to `priority`, behind the edits already waiting there."""
+        if priority < edit.priority:
+            del self.lanes[edit.priority][member_id]
+            edit.priority = priority
+            self.push(member_id, edit)
+
+    def pop(self) -> Tuple[int, PendingEdit]:
+        """Takes the next edit to send."""
+        ready = [priority for priority, lane in enumerate(self.lanes) if lane]
+        if self.weights is None or len(ready) == 1:
+            chosen = ready[0]
+        else:
+            total = 0
+            for priority in ready:
+                self.credits[priority] += self.weights[priority]
+                total += self.weights[priority]
+            chosen = max(ready, key=lambda priority: (self.credits[priority], -priority))
+            self.credits[chosen] -= total
+        return self.lanes[chosen].popitem(last=False)
+
+    def pending(self) -> List[PendingEdit]:
+        return [edit for lane in self.lanes for edit in lane.values()]
+
+
+class NicknameScheduler:
+    """
+    Sends nickname edits through per-guild queues.
+
+    Each guild is drained by workers whose parallel requests are capped by an adaptive
+    limit per guild, starting at `concurrency` and moving between 1 and `max_concurrency`,
+    and by one across all guilds, starting at `global_concurrency` and capped by
+    `global_max_concurrency`. A limit grows by about one per round of clean responses and
+    is halved on a 429 or when a request takes more than `latency_factor` times the usual
+    time (AIMD); a guild's limit is kept at or below the global one. Before each request the worker also waits out the guild's rate-limit
+    bucket as reported by the response headers,
+    and failed requests are retried with exponential backoff on 429 and 5xx responses.
+    Callers get a future that resolves to True once the edit landed, or False if it
+    was given up on.
+
+    Edits that fail for a transient reason are reported to `on_failure`, so the member
+    can be reconciled later.
+
+    Edits are coalesced per member: a newer nickname for a member whose edit has not
+    been sent yet replaces the queued one and shares its future, so a burst of commands
+    costs at most one request per distinct member.
+
+    Edits wait in a lane per `Priority`, so members moved by a command are updated before
+    a backlog of audit fixes. Lanes are drained strictly in order, or by `lane_weights`
+    (one weight per priority) if given. A queued edit that is submitted again at a higher
+    priority moves up to that lane.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        max_retries: int,
+        rate_limits: Optional[RateLimitTracker] = None,
+        echo_ttl: float = 30.0,
+        on_failure: Optional[Callable[[discord.Member], None]] = None,
+        lane_weights: Optional[Sequence[int]] = None,
+        max_concurrency: Optional[int] = None,
+        global_concurrency: int = 16,
+        global_max_concurrency: int = 50,
+        latency_factor: float = 3.0,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.max_concurrency = max(self.concurrency, max_concurrency or self.concurrency)
+        self.latency_factor = latency_factor
+        self.guild_limits: Dict[int, AIMDLimit] = {}
+        self.global_limit = AIMDLimit(global_concurrency, 1, global_max_concurrency, latency_factor=latency_factor)
+        metrics.NICKNAME_CONCURRENCY_LIMIT.set_function(lambda: self.global_limit.limit, scope='global')
+        if lane_weights and len(lane_weights) != len(Priority):
+            logger.error(
+                f"Expected {len(Priority)} nickname lane weights ({', '.join(p.name.lower() for p in Priority)}), "
+                f"got {list(lane_weights)}; draining lanes in strict priority order instead"
+            )
+            lane_weights = None
+        self.lane_weights = [max(1, weight) for weight in lane_weights] if lane_weights else None
+        self.on_failure = on_failure
+        self.max_retries = max_retries
+        self.rate_limits = rate_limits or RateLimitTracker()
+        self.queues: Dict[int, GuildEditQueue] = {}
+        self.tasks = set()
+        self.expected = ExpectedNicknames(echo_ttl)
+        for priority in Priority:
+            metrics.NICKNAME_QUEUE_DEPTH.set_function(
+                lambda priority=priority: self.queue_depth(priority), lane=priority.name.lower()
+            )
+
+    def queue_depth(self, priority: Optional[Priority] = None) -> int:
+        """Returns the number of edits waiting to be sent across all guilds, in one lane or in all."""
+        depth = 0
+        for queue in self.queues.values():
+            if priority is None:
+                depth += len(queue) + len(queue.deferred)
+            else:
+                depth += len(queue.lanes[priority])
+                depth += sum(1 for edit in queue.deferred.values() if edit.priority == priority)
+        return depth
+
+    def guild_limit(self, guild_id: int) -> AIMDLimit:
+        """Returns the adaptive concurrency limit of a guild, kept while the bot runs."""
+        limit = self.guild_limits.get(guild_id)
+        if limit is None:
+            limit = self.guild_limits[guild_id] = AIMDLimit(
+                min(self.concurrency, int(self.global_limit.limit)), 1, self.max_concurrency,
+                latency_factor=self.latency_factor,
+            )
+            metrics.NICKNAME_CONCURRENCY_LIMIT.set_function(lambda: limit.limit, scope=str(guild_id))
+        return limit
+
+    def submit(self, member: discord.Member, nickname: Optional[str], priority: Priority = Priority.INTERACTIVE) -> asyncio.Future:
+        """
+        Queues a nickname edit and returns a future that resolves when it is done.
+        If an edit for the member is still queued, it is replaced by this one.
+        """
+        queue = self.queues.get(member.guild.id)
+        if queue is None:
+            queue = self.queues[member.guild.id] = GuildEditQueue(self.lane_weights)
+        pending = queue.get(member.id)
+        if pending is not None:
+            pending.member = member
+            pending.nickname = nickname
+            queue.promote(member.id, pending, priority)
+            logger.debug(f"Coalesced queued nickname edit for {member.display_name} into '{nickname}'")
+            return pending.future
+        pending = queue.deferred.get(member.id)
+        if pending is not None:
+            pending.member = member
+            pending.nickname = nickname
+            pending.priority = min(pending.priority, priority)
+            return pending.future
+        future = asyncio.get_running_loop().create_future()
+        if member.id in queue.in_flight:
+            # Sending it now could race the edit in flight and land first
+            queue.deferred[member.id] = PendingEdit(member, nickname, future, priority)
+            return future
+        queue.push(member.id, PendingEdit(member, nickname, future, priority))
+        # Workers beyond the current limit wait for a slot, ready for when it grows
+        if queue.workers < self.max_concurrency:
+            queue.workers += 1
+            # The worker outlives the command that started it and sends edits of later ones too
+            with tracing.detached():
+                task = asyncio.create_task(self._worker(member.guild.id, queue))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        return future
+
+    async def _worker(self, guild_id: int, queue: GuildEditQueue):
+        limit = self.guild_limit(guild_id)
+        edit = None
+        try:
+            while len(queue):
+                delay = self.rate_limits.delay_for(guild_id)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+                async with limit.slot(), self.global_limit.slot():
+                    if not len(queue):
+                        # Drained by other workers while this one waited for a slot
+                        break
+                    member_id, edit = queue.pop()
+                    queue.in_flight[member_id] = edit
+                    self.rate_limits.consume(guild_id)
+                    start = time.monotonic()
+                    try:
+                        success = await self._send(edit)
+                    finally:
+                        del queue.in_flight[member_id]
+                        deferred = queue.deferred.pop(member_id, None)
+                        if deferred is not None:
+                            queue.push(member_id, deferred)
+                    self._adapt_limits(guild_id, limit, start)
+                if not edit.future.done():
+                    edit.future.set_result(success)
+        finally:
+            if edit is not None and not edit.future.done():
+                edit.future.cancel()
+            queue.workers -= 1
+            if not len(queue) and queue.workers == 0:
+                self.queues.pop(guild_id, None)
+
+    def _adapt_limits(self, guild_id: int, limit: AIMDLimit, start: float):
+        """Feeds the outcome of an edit sent at monotonic time `start` back into the concurrency limits."""
+        latency = time.monotonic() - start
+        guild_limited = self.rate_limits.rate_limited_since(guild_id, start)
+        global_limited = self.rate_limits.globally_rate_limited_since(start)
+        # An edit that waited for the guild's bucket, e.g. queued behind another edit's 429 in
+        # discord.py, has a latency that says nothing about how busy Discord is
+        contended = self.rate_limits.bucket_contended_since(guild_id, start)
+        feedback = []
+        if guild_limited or not contended:
+            feedback.append(('guild', f"guild {guild_id}", limit, guild_limited))
+        if global_limited or not contended:
+            feedback.append(('global', "all guilds", self.global_limit, global_limited))
+        for scope, name, scope_limit, rate_limited in feedback:
+            reason = scope_limit.record(latency, rate_limited)
+            if reason is not None:
+                metrics.NICKNAME_CONCURRENCY_DECREASES.inc(scope=scope, reason=reason)
+                logger.info(f"Lowered the nickname edit concurrency of {name} to {scope_limit.limit:.1f} ({reason})")
+        # A guild can never have more edits in flight than all guilds together
+        limit.limit = min(limit.limit, self.global_limit.limit)
+
+    async def _send(self, edit: PendingEdit) -> bool:
+        """Sends one edit, retrying on rate limits and server errors."""
+        member = edit.member
+        # Registered before the request, since the gateway event can arrive before the response
+        self.expected.add(member.guild.id, member.id, edit.nickname)
+        success = False
+        try:
+            success = await self._send_with_retries(edit)
+        finally:
+            if not success:
+                self.expected.discard(member.guild.id, member.id)
+        return success
+
+    async def _send_with_retries(self, edit: PendingEdit) -> bool:
+        member = edit.member
+        for attempt in range(self.max_retries + 1):
+            try:
+                metrics.NICKNAME_EDITS.inc()
+                await member.edit(nick=edit.nickname)
+                logger.info(f"Updated nickname for {member.display_name} to '{edit.nickname}'")
+                return True
+            except discord.Forbidden:
+                logger.warning(f"Permission denied to change nickname for {member.display_name}.")
+                metrics.NICKNAME_EDIT_FAILURES.inc(reason='forbidden')
+                return False
+            except discord.NotFound:
+                logger.warning(f"Member {member.display_name} left before their nickname could be changed.")
+                metrics.NICKNAME_EDIT_FAILURES.inc(reason='not_found')
+                return False
+            except discord.HTTPException as e:
+                transient = e.status == 429 or e.status >= 500
+                if not transient or attempt == self.max_retries:
+                    logger.exception(f"An error occurred while changing nickname for {member.display_name}")
+                    metrics.NICKNAME_EDIT_FAILURES.inc(reason=f'http_{e.status}')
+                    if transient:
+                        # A permanent rejection (e.g. a nickname too long) would fail the same way again
+                        self._report_failure(member)
+                    return False
+                retry_after = None
+                if e.status == 429 and e.response is not None:
+                    retry_after = e.response.headers.get('Retry-After')
+                delay = float(retry_after) if retry_after else 2 ** attempt
+                logger.warning(f"Retrying nickname change for {member.display_name} in {delay:.1f}s (HTTP {e.status})")
+                await asyncio.sleep(delay)
+            except Exception:
+                logger.exception(f"An error occurred while changing nickname for {member.display_name}")
+                metrics.NICKNAME_EDIT_FAILURES.inc(reason='error')
+                self._report_failure(member)
+                return False
+        return False
+
+    def _report_failure(self, member: discord.Member):
+        if self.on_failure is not None:
+            self.on_failure(member)
+
+    def close(self):
+        """Cancels the workers and every edit still waiting in a queue."""
+        for task in list(self.tasks):
+            task.cancel()
+        for queue in self.queues.values():
+            for edit in (*queue.pending(), *queue.deferred.values()):
+                edit.future.cancel()
+        self.queues.clear()
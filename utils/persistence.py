@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Callable, Optional
+
+from utils import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write(path: str, text: str) -> int:
+    """
+    Writes `text` to a temporary file next to `path` and renames it over `path`.
+    Returns the number of bytes written.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        data = text.encode()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return len(data)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class WriteBehindSaver:
+    """
+    Coalesces saves of in-memory state.
+
+    Callers mark the state dirty after each change. The first mark schedules a save
+    `delay` seconds later, and every change made until then is written by that one save.
+    `snapshot` runs on the event loop and must return a copy of the state that is safe to
+    hand to another thread; `write` receives that copy and runs in a worker thread. If
+    `write` returns the number of bytes it wrote, it is added to the persistence metrics.
+    """
+
+    def __init__(self, snapshot: Callable[[], Any], write: Callable[[Any], None], delay: float):
+        self.snapshot = snapshot
+        self.write = write
+        self.delay = delay
+        self.dirty = False
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        # Whether the timer is sleeping (and may be cancelled) rather than writing
+        self._waiting = False
+        self._closed = False
+
+    def mark_dirty(self):
+        """Marks the state as changed and schedules a save if none is pending."""
+        self.dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop yet (e.g. during startup); the next flush picks the change up
+            return
+        if not self._closed and (self._timer is None or self._timer.done()):
+            with tracing.detached():
+                self._timer = loop.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        # Changes marked while a write runs find this timer busy, so they are saved by another round
+        while self.dirty and not self._closed:
+            self._waiting = True
+            try:
+                await asyncio.sleep(self.delay)
+            finally:
+                self._waiting = False
+            await self.flush()
+
+    async def flush(self):
+        """Writes the state now if it changed since the last save."""
+        async with self._lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            payload = self.snapshot()
+            start = time.perf_counter()
+            try:
+                with tracing.span('write state'):
+                    written = await asyncio.to_thread(self.write, payload)
+                metrics.PERSIST_DURATION.observe(time.perf_counter() - start)
+                if written:
+                    metrics.PERSIST_BYTES.inc(written)
+            except Exception:
+                # Keep the state dirty so the next flush retries
+                self.dirty = True
+                logger.exception("Failed to save state")
+
+    async def close(self):
+        """Stops the timer, letting a write it already started finish, and writes any outstanding changes."""
+        self._closed = True
+        timer = self._timer
+        if timer is not None and not timer.done():
+            if self._waiting:
+                timer.cancel()
+            # Cancelling a running write would leave its thread writing beside the final one
+            await asyncio.wait([timer])
+        await self.flush()
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+
+def format_duration(seconds: float) -> str:
+    """Formats a duration as e.g. '45s' or '3m 20s'."""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes}m"
+
+
+class PropagationJob:
+    """
+    The nickname edits queued by one rank command, and how far they have got.
+    A member whose edit was not queued (missing permission) counts as failed right away.
+    Members missing from the cache wait in `unresolved` until the job looks them up;
+    those that turn out to have left are dropped from the total.
+    """
+
+    # Failed members named in the summary; the rest are only counted
+    MAX_LISTED_FAILURES = 10
+
+    def __init__(self, command: str):
+        self.command = command
+        self.started = time.monotonic()
+        self.pending: Set[asyncio.Future] = set()
+        self.members: Dict[asyncio.Future, List[discord.Member]] = {}
+        self.failed: List[discord.Member] = []
+        self.unresolved: List[int] = []
+        self.queued = 0
+        self.done = 0
+
+    @property
+    def total(self) -> int:
+        return self.queued + len(self.unresolved)
+
+    def add(self, member: discord.Member, future: Optional[asyncio.Future]):
+        self.queued += 1
+        if future is None:
+            self.done += 1
+            self.failed.append(member)
+            return
+        self.pending.add(future)
+        self.members.setdefault(future, []).append(member)
+
+    @property
+    def finished(self) -> bool:
+        return not self.pending and not self.unresolved
+
+    def _collect(self, futures: Set[asyncio.Future]):
+        for future in futures:
+            self.pending.discard(future)
+            members = self.members.pop(future, [])
+            self.done += len(members)
+            if future.cancelled() or future.exception() is not None or not future.result():
+                self.failed.extend(members)
+
+    async def wait(self, on_progress: Optional[Callable[['PropagationJob'], Awaitable[None]]] = None, interval: float = 5.0):
+        """
+        Waits for every edit, calling `on_progress` at most every `interval` seconds
+        while some are left and more have finished since the last call.
+        """
+        reported = self.done
+        while self.pending:
+            done, _ = await asyncio.wait(self.pending, timeout=interval if on_progress else None)
+            self._collect(done)
+            if self.pending and on_progress is not None and self.done != reported:
+                reported = self.done
+                try:
+                    await on_progress(self)
+                except Exception:
+                    logger.exception(f"Failed to report the progress of a rank {self.command} propagation")
+
+    def progress(self) -> str:
+        """Returns a line describing how many nicknames are updated and when the rest should be."""
+        elapsed = time.monotonic() - self.started
+        line = f"⏳ Updating nicknames: {self.done}/{self.total}"
+        if self.done:
+            eta = elapsed / self.done * (self.total - self.done)
+            line += f" (about {format_duration(eta)} left)"
+        return line
+
+    def summary(self) -> str:
+        """Returns a line describing the finished job and the members whose nickname could not be updated."""
+        elapsed = format_duration(time.monotonic() - self.started)
+        if not self.failed:
+            return f"Updated {self.total} nickname{'s' if self.total != 1 else ''} in {elapsed}."
+        listed = ', '.join(member.mention for member in self.failed[:self.MAX_LISTED_FAILURES])
+        more = len(self.failed) - self.MAX_LISTED_FAILURES
+        if more > 0:
+            listed += f" and {more} more"
+        return (
+            f"⚠️ Updated {self.total - len(self.failed)}/{self.total} nicknames in {elapsed}. "
+            f"Could not update: {listed}."
+        )
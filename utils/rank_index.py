@@ -0,0 +1,276 @@
+import random
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class _Node:
+    """A treap node holding one member id; `size` is the size of the subtree rooted here."""
+
+    __slots__ = ('member_id', 'priority', 'size', 'left', 'right')
+
+    def __init__(self, member_id: str, priority: float):
+        self.member_id = member_id
+        self.priority = priority
+        self.size = 1
+        self.left: Optional['_Node'] = None
+        self.right: Optional['_Node'] = None
+
+
+def _size(node: Optional[_Node]) -> int:
+    return node.size if node is not None else 0
+
+
+def _update(node: _Node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+
+
+def _split(node: Optional[_Node], count: int) -> Tuple[Optional[_Node], Optional[_Node]]:
+    """Splits a subtree into its first `count` nodes and the rest."""
+    if node is None:
+        return None, None
+    left_size = _size(node.left)
+    if count <= left_size:
+        first, node.left = _split(node.left, count)
+        _update(node)
+        return first, node
+    node.right, rest = _split(node.right, count - left_size - 1)
+    _update(node)
+    return node, rest
+
+
+def _merge(first: Optional[_Node], second: Optional[_Node]) -> Optional[_Node]:
+    """Concatenates two subtrees, keeping every node of `first` before those of `second`."""
+    if first is None:
+        return second
+    if second is None:
+        return first
+    if first.priority > second.priority:
+        first.right = _merge(first.right, second)
+        _update(first)
+        return first
+    second.left = _merge(first, second.left)
+    _update(second)
+    return second
+
+
+class RankIndex:
+    """
+    Order-statistic index of ranked members.
+
+    Members are kept in a positional treap ordered by rank, so the ranks along the
+    sequence never decrease. Rank values live in a plain dict next to the tree, which
+    keeps lookups O(1) while inserts, moves and removals cost O(log n). Every mutation
+    returns the contiguous range of positions whose rank changed, so callers only
+    touch the k members that actually moved.
+    """
+
+    def __init__(self, ranks: Optional[Dict[str, int]] = None):
+        self._ranks: Dict[str, int] = {}
+        self._root: Optional[_Node] = None
+        if ranks:
+            self._build(ranks)
+
+    def _build(self, ranks: Dict[str, int]):
+        """Builds the treap from a mapping in O(n log n) for the sort and O(n) for the tree."""
+        self._ranks = {str(member_id): int(rank) for member_id, rank in ranks.items()}
+        ordered = sorted(self._ranks.items(), key=lambda item: item[1])
+        stack: List[_Node] = []
+        for member_id, _ in ordered:
+            node = _Node(member_id, random.random())
+            last = None
+            while stack and stack[-1].priority < node.priority:
+                last = stack.pop()
+            node.left = last
+            if stack:
+                stack[-1].right = node
+            stack.append(node)
+        self._root = stack[0] if stack else None
+        self._fix_sizes()
+
+    def _fix_sizes(self):
+        """Recomputes subtree sizes bottom-up without recursion."""
+        if self._root is None:
+            return
+        order = []
+        pending = [self._root]
+        while pending:
+            node = pending.pop()
+            order.append(node)
+            if node.left is not None:
+                pending.append(node.left)
+            if node.right is not None:
+                pending.append(node.right)
+        for node in reversed(order):
+            _update(node)
+
+    def __len__(self) -> int:
+        return len(self._ranks)
+
+    def __bool__(self) -> bool:
+        return bool(self._ranks)
+
+    def __contains__(self, member_id: str) -> bool:
+        return member_id in self._ranks
+
+    def __iter__(self) -> Iterator[str]:
+        for member_id, _ in self.slice(0, len(self)):
+            yield member_id
+
+    def get(self, member_id: str, default: Optional[int] = None) -> Optional[int]:
+        """Returns the rank of a member, or `default` if the member is not ranked."""
+        return self._ranks.get(member_id, default)
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        """Yields (member_id, rank) pairs in rank order."""
+        return self.slice(0, len(self))
+
+    def to_dict(self) -> Dict[str, int]:
+        """Returns a plain copy of the member-to-rank mapping."""
+        return dict(self._ranks)
+
+    def lower_bound(self, rank: int) -> int:
+        """Returns the position of the first member whose rank is >= `rank`."""
+        position = 0
+        node = self._root
+        while node is not None:
+            if self._ranks[node.member_id] >= rank:
+                node = node.left
+            else:
+                position += _size(node.left) + 1
+                node = node.right
+        return position
+
+    def upper_bound(self, rank: int) -> int:
+        """Returns the position of the first member whose rank is > `rank`."""
+        position = 0
+        node = self._root
+        while node is not None:
+            if self._ranks[node.member_id] > rank:
+                node = node.left
+            else:
+                position += _size(node.left) + 1
+                node = node.right
+        return position
+
+    def position(self, member_id: str) -> Optional[int]:
+        """Returns the position of a member in rank order, or None if the member is not ranked."""
+        rank = self._ranks.get(member_id)
+        if rank is None:
+            return None
+        start = self.lower_bound(rank)
+        # Only members sharing the same rank are scanned, which is normally just one
+        for offset, (candidate, _) in enumerate(self.slice(start, len(self))):
+            if candidate == member_id:
+                return start + offset
+        raise RuntimeError(f"Rank index is inconsistent for member {member_id}")
+
+    def slice(self, start: int, stop: int) -> Iterator[Tuple[str, int]]:
+        """Yields (member_id, rank) pairs for positions in [start, stop) in O(log n + k)."""
+        start = max(start, 0)
+        remaining = min(stop, len(self)) - start
+        if remaining <= 0:
+            return
+        # Descend to the node at `start`, remembering the ancestors still to be visited
+        stack: List[_Node] = []
+        node = self._root
+        offset = start
+        while node is not None:
+            left_size = _size(node.left)
+            if offset < left_size:
+                stack.append(node)
+                node = node.left
+            elif offset == left_size:
+                stack.append(node)
+                break
+            else:
+                offset -= left_size + 1
+                node = node.right
+        while stack and remaining > 0:
+            node = stack.pop()
+            yield node.member_id, self._ranks[node.member_id]
+            remaining -= 1
+            child = node.right
+            while child is not None:
+                stack.append(child)
+                child = child.left
+
+    def _shift(self, start: int, stop: int, delta: int):
+        """Adds `delta` to the rank of every member at positions [start, stop)."""
+        for member_id, rank in list(self.slice(start, stop)):
+            self._ranks[member_id] = rank + delta
+
+    def _insert_at(self, position: int, node: _Node):
+        first, rest = _split(self._root, position)
+        self._root = _merge(_merge(first, node), rest)
+
+    def _remove_at(self, position: int) -> _Node:
+        first, rest = _split(self._root, position)
+        node, rest = _split(rest, 1)
+        self._root = _merge(first, rest)
+        node.left = node.right = None
+        node.size = 1
+        return node
+
+    def set(self, member_id: str, new_rank: int) -> range:
+        """
+        Assigns `new_rank` to a member and shifts the members in between, exactly like
+        moving an entry in a ladder. Returns the range of positions whose rank changed,
+        including the member itself.
+        """
+        old_rank = self._ranks.get(member_id)
+        if old_rank == new_rank:
+            position = self.position(member_id)
+            return range(position, position)
+
+        if old_rank is None:
+            # New entry: everyone at or below the new rank moves down by one
+            node = _Node(member_id, random.random())
+            start = self.lower_bound(new_rank)
+            self._shift(start, len(self), 1)
+            self._ranks[member_id] = new_rank
+            self._insert_at(start, node)
+            return range(start, len(self))
+
+        node = self._remove_at(self.position(member_id))
+        del self._ranks[member_id]
+        if new_rank < old_rank:
+            # Moving up: ranks in [new_rank, old_rank) move down by one
+            start = self.lower_bound(new_rank)
+            stop = self.lower_bound(old_rank)
+            self._shift(start, stop, 1)
+            self._ranks[member_id] = new_rank
+            self._insert_at(start, node)
+            return range(start, stop + 1)
+
+        # Moving down: ranks in (old_rank, new_rank] move up by one
+        start = self.upper_bound(old_rank)
+        stop = self.upper_bound(new_rank)
+        self._shift(start, stop, -1)
+        self._ranks[member_id] = new_rank
+        self._insert_at(stop, node)
+        return range(start, stop + 1)
+
+    def remove(self, member_id: str) -> Optional[range]:
+        """
+        Removes a member and closes the gap behind them. Returns the range of positions
+        whose rank changed, or None if the member was not ranked.
+        """
+        old_rank = self._ranks.get(member_id)
+        if old_rank is None:
+            return None
+        self._remove_at(self.position(member_id))
+        del self._ranks[member_id]
+        start = self.upper_bound(old_rank)
+        self._shift(start, len(self), -1)
+        return range(start, len(self))
+
+    def compact(self) -> List[str]:
+        """
+        Renumbers ranks sequentially from 1 in the current order, filling any gaps.
+        Returns the ids of members whose rank changed.
+        """
+        changed = []
+        for position, (member_id, rank) in enumerate(list(self.items()), start=1):
+            if rank != position:
+                self._ranks[member_id] = position
+                changed.append(member_id)
+        return changed
@@ -0,0 +1,29 @@
+from typing import List
+
+# Discord rejects message content longer than this
+MESSAGE_LIMIT = 2000
+CODE_BLOCK = "```\n{}\n```"
+
+
+def paginate(lines: List[str], limit: int = MESSAGE_LIMIT) -> List[str]:
+    """
+    Packs rank list lines into code-block pages that each fit in one message.
+    A line too long for a page on its own is truncated.
+    """
+    budget = limit - len(CODE_BLOCK.format(''))
+    pages = []
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        line = line[:budget]
+        # Every line after the first on a page also needs its newline
+        added = len(line) + (1 if current else 0)
+        if current and size + added > budget:
+            pages.append(CODE_BLOCK.format("\n".join(current)))
+            current, size = [], 0
+            added = len(line)
+        current.append(line)
+        size += added
+    if current:
+        pages.append(CODE_BLOCK.format("\n".join(current)))
+    return pages
@@ -1,53 +1,158 @@
-import json
-import os
 import re
 import asyncio
+import bisect
+import hashlib
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
 import logging
-from typing import Optional, Dict, List
+from typing import Awaitable, Callable, Optional, Dict, List, Set
 
 import discord
 
 import config
+from utils.guild_state import GuildRankState
+from utils.member_resolver import MemberResolver
+from utils.member_stream import MemberSource, iterate_members
+from utils.fingerprint import MemberFingerprint
+from utils import metrics, tracing
+from utils.nickname_scheduler import NicknameScheduler, Priority
+from utils.persistence import WriteBehindSaver
+from utils.propagation import PropagationJob
+from utils.rank_index import RankIndex
+from utils.rank_list import paginate
+from utils.render_scheduler import RenderScheduler
+from utils.rate_limits import RateLimitTracker
+from utils.storage import create_storage
 
 logger = logging.getLogger(__name__)
 
+
+@contextmanager
+def phase(command: str, name: str):
+    """Times a phase of a rank command, as a tracing span and in the command latency metric."""
+    with tracing.span(name), metrics.COMMAND_DURATION.time(command=command, phase=name):
+        yield
+
+
 class RankManager:
     """Manages user ranks, including loading, saving, parsing, and enforcing ranks."""
 
-    def __init__(self):
-        self.user_ranks: Dict[str, int] = {}
-        self.rank_message_id: Optional[int] = None
-        self.lock = asyncio.Lock()
-        self.DATA_FILE = os.path.join(os.path.dirname(__file__), '../data/ranks.json')
-        self.load_ranks_from_file()
-
-    def load_ranks_from_file(self):
-        """Load user ranks and rank message ID from 'ranks.json' file if it exists."""
-        if os.path.exists(self.DATA_FILE):
-            try:
-                with open(self.DATA_FILE, 'r') as f:
-                    data = json.load(f)
-                    self.user_ranks = data.get('user_ranks', {})
-                    self.rank_message_id = data.get('rank_message_id')
-                    logger.info("Loaded ranks and rank message ID from 'ranks.json'")
-            except Exception as e:
-                logger.exception("Failed to load ranks from 'ranks.json'")
-        else:
-            logger.info("'ranks.json' not found. Starting with empty ranks.")
-
-    def save_ranks_to_file(self):
-        """Save user ranks and rank message ID to 'ranks.json' file."""
-        data = {
-            'user_ranks': self.user_ranks,
-            'rank_message_id': self.rank_message_id
-        }
-        try:
-            os.makedirs(os.path.dirname(self.DATA_FILE), exist_ok=True)
-            with open(self.DATA_FILE, 'w') as f:
-                json.dump(data, f, indent=4)
-                logger.info("Saved ranks and rank message ID to 'ranks.json'")
-        except Exception as e:
-            logger.exception("Failed to save ranks to 'ranks.json'")
+    def __init__(self, rate_limits: Optional[RateLimitTracker] = None):
+        self.storage = create_storage()
+        # Ranks from a pre-multi-guild 'ranks.json', used to seed guilds without their own section
+        self.guilds, self.legacy_section = self.storage.load()
+        self.saver = WriteBehindSaver(self.prepare_save, self.storage.write_save, config.RANK_SAVE_DELAY)
+        self.scheduler = NicknameScheduler(
+            config.NICKNAME_EDIT_CONCURRENCY,
+            config.NICKNAME_EDIT_MAX_RETRIES,
+            rate_limits,
+            config.NICKNAME_ECHO_TTL,
+            on_failure=self.mark_member_dirty,
+            lane_weights=config.NICKNAME_LANE_WEIGHTS,
+            max_concurrency=config.NICKNAME_EDIT_MAX_CONCURRENCY,
+            global_concurrency=config.NICKNAME_EDIT_GLOBAL_CONCURRENCY,
+            global_max_concurrency=config.NICKNAME_EDIT_GLOBAL_MAX_CONCURRENCY,
+            latency_factor=config.NICKNAME_LATENCY_SPIKE_FACTOR,
+        )
+        # Members per guild whose nickname may disagree with their rank and must be reconciled
+        self.dirty_members: Dict[int, Set[int]] = {}
+        # Member ids of each guild in the order the current rolling audit pass walks them
+        self.audit_orders: Dict[int, List[int]] = {}
+        self.resolver = MemberResolver(config.MEMBER_NOT_FOUND_TTL)
+        self.renderer = RenderScheduler(self.update_rank_message, config.RANK_RENDER_INTERVAL)
+        # Nickname propagations of rank commands that already replied
+        self.jobs: Set[asyncio.Task] = set()
+
+    def get_state(self, guild_id: int) -> GuildRankState:
+        """Returns the rank state of a guild, creating it on first use."""
+        state = self.guilds.get(guild_id)
+        if state is None:
+            if self.legacy_section is not None:
+                state = GuildRankState.from_section(guild_id, self.legacy_section)
+                # The seeded ranks were never recorded as operations, so they are saved in full
+                self.storage.request_snapshot(guild_id)
+                logger.info(f"Seeded ranks of guild {guild_id} from the legacy 'ranks.json' layout")
+            else:
+                state = GuildRankState(guild_id)
+            self.guilds[guild_id] = state
+        return state
+
+    def record(self, state: GuildRankState, record: dict):
+        """Records an operation that was just applied to a guild's state and schedules a save."""
+        if record['op'] != 'audit':
+            self.save_audit_cursor(state)
+        record['guild'] = str(state.guild_id)
+        self.storage.record(record)
+        state.touch()
+        self.saver.mark_dirty()
+
+    def save_audit_cursor(self, state: GuildRankState):
+        """Records the rolling audit cursor of a guild if it moved since it was last saved."""
+        if state.audit_cursor != state.saved_audit_cursor:
+            state.saved_audit_cursor = state.audit_cursor
+            self.record(state, {'op': 'audit', 'audit_cursor': state.audit_cursor})
+
+    def mark_dirty(self, state: GuildRankState):
+        """Records a bulk change to a guild's state that is saved in full."""
+        self.storage.request_snapshot(state.guild_id)
+        state.touch()
+        self.saver.mark_dirty()
+
+    def prepare_save(self) -> tuple:
+        """Takes what the next save has to write; runs on the event loop."""
+        return self.storage.prepare_save(self.guilds)
+
+    async def flush(self):
+        """Writes any pending changes to disk now."""
+        await self.saver.flush()
+
+    def forget_rank_message(self, guild: discord.Guild, message_id: int) -> bool:
+        """
+        Handles the deletion of a message. If it was a rank list page, the list is
+        re-rendered so the page is posted again. Returns True if it was a page.
+        """
+        state = self.guilds.get(guild.id)
+        if state is None or message_id not in state.rank_message_ids:
+            return False
+        logger.info(f"A rank list page was deleted in guild '{guild.name}'")
+        # A page posted again lands at the end of the channel, so the pages after it are reposted too
+        index = state.rank_message_ids.index(message_id)
+        state.stale_message_ids.extend(state.rank_message_ids[index + 1:])
+        state.rank_message_ids = state.rank_message_ids[:index]
+        state.rendered_pages = state.rendered_pages[:index]
+        state.rendered_hash = None
+        self.record(state, {'op': 'messages', 'rank_message_ids': state.rank_message_ids})
+        self.renderer.mark_dirty(guild)
+        return True
+
+    def forget_rank_channel(self, guild: discord.Guild, channel_id: int) -> bool:
+        """
+        Handles the deletion or renaming of a channel. If it was the rank channel, its cached
+        id and pages are dropped and the list is posted again. Returns True if it was.
+        """
+        state = self.guilds.get(guild.id)
+        if state is None or state.rank_channel_id != channel_id:
+            return False
+        logger.info(f"The rank channel of guild '{guild.name}' was deleted or renamed")
+        state.rank_channel_id = None
+        state.rank_message_ids = []
+        self.record(state, {'op': 'channel', 'rank_channel_id': None})
+        self.record(state, {'op': 'messages', 'rank_message_ids': []})
+        state.forget_rendered()
+        self.renderer.mark_dirty(guild)
+        return True
+
+    async def close(self):
+        """Stops pending nickname edits, writes any pending changes and releases the storage backend."""
+        for task in list(self.jobs):
+            task.cancel()
+        self.scheduler.close()
+        self.renderer.close()
+        for state in self.guilds.values():
+            self.save_audit_cursor(state)
+        await self.saver.close()
+        self.storage.close()
 
     @staticmethod
     def parse_rank(nickname: Optional[str]) -> Optional[int]:
@@ -63,53 +168,106 @@ class RankManager:
                 return rank
         return None
 
-    async def load_ranks_from_nicknames(self, guild: discord.Guild, members: List[discord.Member]):
+    @tracing.span('load ranks from nicknames')
+    async def load_ranks_from_nicknames(self, guild: discord.Guild, members: MemberSource):
         """
         Loads ranks from guild members' nicknames and updates the user ranks accordingly.
-        Saves the ranks to the file after loading.
+        Members may be streamed in as they are fetched. Saves the ranks to the file after loading.
         """
-        logger.info("Loading ranks from nicknames...")
-        for member in members:
+        logger.info(f"Loading ranks from nicknames in guild: {guild.name}")
+        state = self.get_state(guild.id)
+        user_ranks = state.user_ranks.to_dict()
+        async for member in iterate_members(members):
             nickname = member.nick
             if nickname is None:
                 continue  # Skip members without a nickname
             rank = self.parse_rank(nickname)
             if rank is not None:
-                self.user_ranks[str(member.id)] = rank
+                user_ranks[str(member.id)] = rank
                 logger.debug(f"Loaded rank {rank} for member {member.display_name}")
             else:
                 logger.debug(f"No rank found in nickname for member {member.display_name}")
-        self.save_ranks_to_file()
+        state.user_ranks = RankIndex(user_ranks)
+        self.mark_dirty(state)
+        await self.flush()
 
-    async def enforce_ranks_on_discord(self, guild: discord.Guild, members: List[discord.Member]):
+    @tracing.span('enforce ranks')
+    async def enforce_ranks_on_discord(self, guild: discord.Guild, members: MemberSource, priority: Priority = Priority.AUDIT) -> int:
         """
-        Updates Discord members' nicknames to match the ranks stored in user_ranks.
+        Updates Discord members' nicknames to match the ranks stored for their guild.
         Ensures that each member's nickname correctly reflects their assigned rank.
+        Members may be streamed in as they are fetched; edits are queued as soon as each one arrives,
+        in the `priority` lane.
+        Returns the number of members whose nickname did not match.
         """
-        logger.info("Enforcing ranks on Discord nicknames...")
-        for member in members:
+        logger.debug(f"Enforcing ranks on Discord nicknames in guild: {guild.name}")
+        user_ranks = self.get_state(guild.id).user_ranks
+        pending = []
+        async for member in iterate_members(members):
             user_id_str = str(member.id)
-            expected_rank = self.user_ranks.get(user_id_str)
+            expected_rank = user_ranks.get(user_id_str)
             current_rank_in_nickname = self.parse_rank(member.nick)
 
             if expected_rank is not None:
                 # Member is expected to have a rank
                 if current_rank_in_nickname != expected_rank:
                     logger.info(f"Updating rank for member {member.display_name} to {expected_rank}")
-                    await self.update_nickname(member, expected_rank)
+                    pending.append(self.queue_nickname(member, expected_rank, priority))
                 else:
                     logger.debug(f"Member {member.display_name} already has correct rank {expected_rank}")
             else:
                 # Member should not have a rank; remove any rank from nickname
                 if current_rank_in_nickname is not None:
                     logger.info(f"Removing rank from member {member.display_name} as they are not in user_ranks")
-                    await self.update_nickname(member, None)
+                    pending.append(self.queue_nickname(member, None, priority))
                 else:
                     logger.debug(f"Member {member.display_name} has no rank and is correct")
+        await self.wait_for_nicknames(pending)
+        return len(pending)
 
-    async def update_nickname(self, member: discord.Member, new_rank: Optional[int]):
+    @tracing.span('enforce ranks on startup')
+    async def enforce_ranks_on_startup(self, guild: discord.Guild, members: MemberSource):
+        """
+        Enforces ranks after a restart, skipping the guild entirely when its nicknames and
+        ranks match the fingerprint stored when it was last known to be consistent.
+        Otherwise only the members that are ranked or show a rank in their nickname are checked.
         """
-        Updates a member's nickname to include the new rank, or removes the rank if new_rank is None.
+        state = self.get_state(guild.id)
+        fingerprint = MemberFingerprint()
+        candidates = []
+        async for member in iterate_members(members):
+            fingerprint.add(member.id, member.nick)
+            if str(member.id) in state.user_ranks or self.parse_rank(member.nick) is not None:
+                candidates.append(member)
+
+        if state.fingerprint is not None and state.fingerprint == fingerprint.combine(state.user_ranks.to_dict()):
+            logger.info(f"Nicknames in guild '{guild.name}' are unchanged since the last run, skipping enforcement")
+            return
+        logger.info(f"Checking {len(candidates)} of {fingerprint.count} members in guild '{guild.name}'")
+        await self.enforce_ranks_on_discord(guild, candidates, Priority.AUDIT)
+
+    def store_fingerprint(self, guild: discord.Guild):
+        """
+        Stores the fingerprint of the guild's cached nicknames and ranks if every nickname
+        matches its rank, so the next startup can skip enforcement. Clears it otherwise.
+        """
+        state = self.get_state(guild.id)
+        fingerprint = MemberFingerprint()
+        consistent = True
+        for member in guild.members:
+            fingerprint.add(member.id, member.nick)
+            if consistent and self.parse_rank(member.nick) != state.user_ranks.get(str(member.id)):
+                consistent = False
+        value = fingerprint.combine(state.user_ranks.to_dict()) if consistent else None
+        if value != state.fingerprint:
+            state.fingerprint = value
+            self.record(state, {'op': 'fingerprint', 'fingerprint': value})
+
+    @staticmethod
+    def format_nickname(member: discord.Member, new_rank: Optional[int]) -> Optional[str]:
+        """
+        Returns the member's nickname with the new rank, or without a rank if new_rank is None.
+        Returns None when the result equals the username, which removes the nickname.
         """
         # Extract the base nickname without rank
         if member.nick is not None:
@@ -126,123 +284,294 @@ class RankManager:
         # If the new nickname is the same as the username, set nick to None to remove nickname
         if new_nickname == member.name:
             new_nickname = None
+        return new_nickname
 
+    def queue_nickname(self, member: discord.Member, new_rank: Optional[int], priority: Priority = Priority.INTERACTIVE) -> Optional[asyncio.Future]:
+        """
+        Queues a nickname update for a member on the edit scheduler, in the `priority` lane.
+        Returns a future resolving to whether the edit landed, or None if the bot may not change nicknames.
+        """
+        if not member.guild.me.guild_permissions.manage_nicknames:
+            logger.warning(f"Cannot change nickname for {member.display_name}: Missing 'Manage Nicknames' permission.")
+            return None
+        return self.scheduler.submit(member, self.format_nickname(member, new_rank), priority)
+
+    @staticmethod
+    async def wait_for_nicknames(pending: List[Optional[asyncio.Future]]):
+        """Waits until every queued nickname update has completed or been given up on."""
+        futures = [future for future in pending if future is not None]
+        if futures:
+            await asyncio.gather(*futures, return_exceptions=True)
+
+    def is_own_nickname_update(self, member: discord.Member) -> bool:
+        """Returns True if the member's nickname is one the bot just wrote itself."""
+        return self.scheduler.expected.consume(member.guild.id, member.id, member.nick)
+
+    def mark_member_dirty(self, member: discord.Member):
+        """Schedules a member for the next reconciliation of their guild."""
+        self.dirty_members.setdefault(member.guild.id, set()).add(member.id)
+
+    @tracing.span('reconcile changed members')
+    async def reconcile_dirty_members(self, guild: discord.Guild) -> int:
+        """
+        Enforces ranks on the members of a guild marked dirty since the last pass.
+        Returns the number of members checked.
+        """
+        member_ids = self.dirty_members.pop(guild.id, None)
+        if not member_ids:
+            return 0
+        members = [member for member in map(guild.get_member, member_ids) if member is not None]
+        drift = await self.enforce_ranks_on_discord(guild, members, Priority.EVENT)
+        metrics.RECONCILE_DRIFT.set(drift, source='event')
+        metrics.RECONCILE_DRIFT_TOTAL.inc(drift, source='event')
+        return len(members)
+
+    @tracing.span('audit slice')
+    async def audit_next_slice(self, guild: discord.Guild, slice_size: int) -> int:
+        """
+        Enforces ranks on the next `slice_size` members of the guild's rolling audit.
+        Members are walked in id order from the persisted cursor, so a restart resumes the pass.
+        A slice without drift only moves the cursor in memory; it is saved with the next change,
+        when a pass completes, and on shutdown.
+        Returns the number of members checked.
+        """
+        state = self.get_state(guild.id)
+        order = self.audit_orders.get(guild.id)
+        if order is None or state.audit_cursor == 0:
+            # Members who join during the pass are reconciled by their join event
+            order = self.audit_orders[guild.id] = sorted(member.id for member in guild.members)
+            if state.audit_cursor == 0:
+                logger.info(f"Starting a rolling audit pass over {len(order)} members in guild '{guild.name}'")
+
+        start = bisect.bisect_right(order, state.audit_cursor)
+        member_ids = order[start:start + slice_size]
+        members = [member for member in map(guild.get_member, member_ids) if member is not None]
+        drift = await self.enforce_ranks_on_discord(guild, members, Priority.AUDIT)
+        metrics.RECONCILE_DRIFT.set(drift, source='audit')
+        metrics.RECONCILE_DRIFT_TOTAL.inc(drift, source='audit')
+
+        if start + slice_size >= len(order):
+            logger.info(f"Completed a rolling audit pass in guild '{guild.name}'")
+            state.audit_cursor = 0
+            self.audit_orders.pop(guild.id, None)
+        else:
+            state.audit_cursor = member_ids[-1]
+        if drift or state.audit_cursor == 0:
+            self.save_audit_cursor(state)
+        return len(members)
+
+    @staticmethod
+    def audit_slice_size(member_count: int) -> int:
+        """Returns how many members each audit tick checks so a pass takes about AUDIT_PERIOD seconds."""
+        if config.AUDIT_SLICE_SIZE > 0:
+            return config.AUDIT_SLICE_SIZE
+        ticks_per_pass = max(1.0, config.AUDIT_PERIOD / config.AUDIT_TICK_INTERVAL)
+        return max(1, math.ceil(member_count / ticks_per_pass))
+
+    def queue_member_nicknames(self, guild: discord.Guild, member_ids: List[int], job: PropagationJob):
+        """
+        Queues nickname updates to the current ranks of the cached members among `member_ids`,
+        and leaves the others on the job to be looked up by `propagate`.
+        """
+        user_ranks = self.get_state(guild.id).user_ranks
+        members, job.unresolved = self.resolver.cached(guild, member_ids)
+        for member_id, member in members.items():
+            job.add(member, self.queue_nickname(member, user_ranks.get(str(member_id))))
+
+    async def queue_unresolved_nicknames(self, guild: discord.Guild, job: PropagationJob):
+        """Looks up the members a job could not find in the cache and queues their nickname updates."""
+        member_ids, job.unresolved = job.unresolved, []
+        with tracing.span('resolve members', count=len(member_ids)):
+            members = await self.resolver.resolve(guild, member_ids)
+        # Ranks are read now rather than at commit, so a later command's ranks are never overwritten
+        user_ranks = self.get_state(guild.id).user_ranks
+        for member_id, member in members.items():
+            job.add(member, self.queue_nickname(member, user_ranks.get(str(member_id))))
+
+    @staticmethod
+    @asynccontextmanager
+    async def locked(state: GuildRankState, operation: str):
+        """Holds the guild's rank lock, recording how long it took to get it."""
+        start = time.perf_counter()
+        with tracing.span('lock wait'):
+            await state.lock.acquire()
+        metrics.LOCK_WAIT.observe(time.perf_counter() - start, operation=operation)
         try:
-            if member.guild.me.guild_permissions.manage_nicknames:
-                await member.edit(nick=new_nickname)
-                logger.info(f"Updated nickname for {member.display_name} to '{new_nickname}'")
-            else:
-                logger.warning(f"Cannot change nickname for {member.display_name}: Missing 'Manage Nicknames' permission.")
-        except discord.Forbidden:
-            logger.warning(f"Permission denied to change nickname for {member.display_name}.")
-        except Exception as e:
-            logger.exception(f"An error occurred while changing nickname for {member.display_name}")
+            yield
         finally:
-            # Save the ranks after attempting to update the nickname
-            self.save_ranks_to_file()
+            state.lock.release()
 
-    async def adjust_ranks(self, guild: discord.Guild, target_member_id: int, old_rank: Optional[int], new_rank: int):
+    @tracing.span('adjust ranks')
+    async def commit_rank_set(self, guild: discord.Guild, target_member_id: int, old_rank: Optional[int], new_rank: int) -> PropagationJob:
+        """
+        Moves a member to a new rank, shifting the ranks in between, saves the change and queues
+        the nickname updates of cached members. Returns the job tracking those updates;
+        `propagate` finishes it.
+        """
         logger.info(f"Adjusting ranks in guild: {guild.name}")
 
-        async with self.lock:
-            user_id_str = str(target_member_id)
-
-            # Remove old rank if any
-            if old_rank is not None:
-                self.user_ranks.pop(user_id_str, None)
-
-            affected_user_ids = set()
-
-            # Adjust ranks of other users
-            if old_rank is not None:
-                if new_rank < old_rank:
-                    # Moving up: increment ranks between new_rank and old_rank -1
-                    for uid in self.user_ranks:
-                        rank = self.user_ranks[uid]
-                        if new_rank <= rank < old_rank:
-                            self.user_ranks[uid] += 1
-                            affected_user_ids.add(uid)
-                elif new_rank > old_rank:
-                    # Moving down: decrement ranks between old_rank +1 and new_rank
-                    for uid in self.user_ranks:
-                        rank = self.user_ranks[uid]
-                        if old_rank < rank <= new_rank:
-                            self.user_ranks[uid] -= 1
-                            affected_user_ids.add(uid)
-                # Else, new_rank == old_rank, do nothing
-            else:
-                # Member didn't have an old rank
-                # Need to increment ranks of members with rank >= new_rank
-                for uid in self.user_ranks:
-                    rank = self.user_ranks[uid]
-                    if rank >= new_rank:
-                        self.user_ranks[uid] += 1
-                        affected_user_ids.add(uid)
-
-            # Assign new rank to target member
-            self.user_ranks[user_id_str] = new_rank
-            affected_user_ids.add(user_id_str)
-
-            # Update nicknames of affected members
-            for uid in affected_user_ids:
-                member_id = int(uid)
-                member = guild.get_member(member_id)
-                if member is None:
-                    try:
-                        member = await guild.fetch_member(member_id)
-                    except discord.NotFound:
-                        logger.warning(f"Member with ID {member_id} not found.")
-                        continue
-                rank = self.user_ranks[uid]
-                await self.update_nickname(member, rank)
-                logger.info(f"Updated nickname for {member.display_name} to include rank {rank}")
-
-            self.save_ranks_to_file()
-
-            # Update the rank list message in the designated channel
-            await self.update_rank_message(guild)
+        state = self.get_state(guild.id)
+        job = PropagationJob('set')
+        async with self.locked(state, 'set'):
+            with phase('set', 'shift'):
+                # The index shifts the ranks in between and reports which positions moved
+                affected = state.user_ranks.set(str(target_member_id), new_rank)
+                self.record(state, {'op': 'set', 'member': str(target_member_id), 'rank': new_rank})
+            logger.debug(f"Rank of member {target_member_id} moved from {old_rank} to {new_rank}, {len(affected)} entries affected")
+
+            # Queue nickname updates of affected members while the order of commands is still fixed
+            with phase('set', 'queue'):
+                member_ids = [int(uid) for uid, _ in state.user_ranks.slice(affected.start, affected.stop)]
+                self.queue_member_nicknames(guild, member_ids, job)
+
+        # The change is on disk before the command reports it
+        with phase('set', 'persist'):
+            await self.flush()
+        return job
+
+    @tracing.span('remove rank')
+    async def commit_rank_remove(self, guild: discord.Guild, member: discord.Member) -> Optional[PropagationJob]:
+        """
+        Removes a member's rank, moves everyone ranked below them up by one, saves the change and
+        queues the nickname updates of cached members.
+        Returns the job tracking those updates, or None if the member had no rank.
+        """
+        state = self.get_state(guild.id)
+        job = PropagationJob('remove')
+        async with self.locked(state, 'remove'):
+            if state.user_ranks.get(str(member.id)) is None:
+                return None
+
+            with phase('remove', 'shift'):
+                affected = state.user_ranks.remove(str(member.id))
+                self.record(state, {'op': 'remove', 'member': str(member.id)})
+
+            # Update the member's nickname to remove the rank alongside the affected members
+            with phase('remove', 'queue'):
+                job.add(member, self.queue_nickname(member, None))
+                member_ids = [int(uid) for uid, _ in state.user_ranks.slice(affected.start, affected.stop)]
+                self.queue_member_nicknames(guild, member_ids, job)
+
+        with phase('remove', 'persist'):
+            await self.flush()
+        return job
+
+    @tracing.span('fill rank gaps')
+    async def commit_rank_fill(self, guild: discord.Guild) -> PropagationJob:
+        """
+        Reassigns ranks to ensure they are sequential and start from 1, filling any gaps,
+        saves them and queues the nickname updates of cached members. Returns the job tracking them.
+        """
+        logger.info(f"Filling rank gaps to ensure sequential ranks in guild: {guild.name}")
+        state = self.get_state(guild.id)
+        job = PropagationJob('fill')
+        with phase('fill', 'shift'):
+            # Reassign ranks starting from 1, keeping the current order
+            changed = state.user_ranks.compact()
+            if changed:
+                self.record(state, {'op': 'fill', 'ranks': {uid: state.user_ranks.get(uid) for uid in changed}})
+        with phase('fill', 'queue'):
+            self.queue_member_nicknames(guild, [int(user_id_str) for user_id_str in changed], job)
+        logger.info(f"Reassigned {len(changed)} ranks in guild: {guild.name}")
+        with phase('fill', 'persist'):
+            await self.flush()
+        return job
+
+    @tracing.span('propagate ranks')
+    async def propagate(
+        self,
+        guild: discord.Guild,
+        job: PropagationJob,
+        on_progress: Optional[Callable[[PropagationJob], Awaitable[None]]] = None,
+    ):
+        """
+        Looks up the members of a committed rank change that were not cached, then waits for
+        the nickname updates, reporting progress to `on_progress` every
+        PROPAGATION_PROGRESS_INTERVAL seconds, and renders the rank list.
+        Edits are awaited outside the lock so later commands can coalesce edits still in the queue.
+        """
+        if job.unresolved:
+            with phase(job.command, 'queue'):
+                await self.queue_unresolved_nicknames(guild, job)
+        with phase(job.command, 'edits'):
+            await job.wait(on_progress, config.PROPAGATION_PROGRESS_INTERVAL)
+
+        # Schedule an update of the rank list in the designated channel
+        self.renderer.mark_dirty(guild)
+        # Saves state recorded while the edits ran, such as a rank channel created meanwhile
+        await self.flush()
+
+    def start_propagation(
+        self,
+        guild: discord.Guild,
+        job: PropagationJob,
+        on_progress: Optional[Callable[[PropagationJob], Awaitable[None]]] = None,
+        on_done: Optional[Callable[[PropagationJob], Awaitable[None]]] = None,
+    ) -> asyncio.Task:
+        """Runs `propagate` as a background job, calling `on_done` once it has finished."""
+        async def run():
+            try:
+                await self.propagate(guild, job, on_progress)
+            except Exception:
+                logger.exception(f"Rank {job.command} propagation failed in guild '{guild.name}'")
+            if on_done is not None:
+                try:
+                    await on_done(job)
+                except Exception:
+                    logger.exception(f"Failed to report a finished rank {job.command} propagation")
+
+        # Traced on its own; the command that started it has replied by then
+        with tracing.detached():
+            task = asyncio.create_task(run())
+        self.jobs.add(task)
+        task.add_done_callback(self.jobs.discard)
+        return task
+
+    async def adjust_ranks(self, guild: discord.Guild, target_member_id: int, old_rank: Optional[int], new_rank: int):
+        """Moves a member to a new rank and waits until every affected nickname is updated."""
+        job = await self.commit_rank_set(guild, target_member_id, old_rank, new_rank)
+        await self.propagate(guild, job)
+
+    async def remove_rank(self, guild: discord.Guild, member: discord.Member) -> Optional[int]:
+        """
+        Removes a member's rank and waits until every affected nickname is updated.
+        Returns the removed rank, or None if the member had no rank.
+        """
+        old_rank = self.get_state(guild.id).user_ranks.get(str(member.id))
+        job = await self.commit_rank_remove(guild, member)
+        if job is None:
+            return None
+        await self.propagate(guild, job)
+        return old_rank
 
     async def fill_rank_gaps(self, guild: discord.Guild):
         """
         Reassigns ranks to ensure they are sequential and start from 1, filling any gaps.
         Updates members' nicknames accordingly and saves the ranks to the file.
         """
-        logger.info("Filling rank gaps to ensure sequential ranks...")
-        # Get all user IDs and their ranks
-        rank_items = list(self.user_ranks.items())
-        # Sort the items by rank
-        rank_items.sort(key=lambda x: x[1])
-        # Reassign ranks starting from 1
-        new_user_ranks = {}
-        for i, (user_id_str, _) in enumerate(rank_items, start=1):
-            new_user_ranks[user_id_str] = i
-
-        # Update nicknames if ranks have changed
-        for user_id_str, new_rank in new_user_ranks.items():
-            old_rank = self.user_ranks.get(user_id_str)
-            if old_rank != new_rank:
-                member_id = int(user_id_str)
-                member = guild.get_member(member_id)
-                if member is None:
-                    try:
-                        member = await guild.fetch_member(member_id)
-                    except discord.NotFound:
-                        logger.warning(f"Member with ID {member_id} not found.")
-                        continue
-                self.user_ranks[user_id_str] = new_rank
-                await self.update_nickname(member, new_rank)
-                logger.info(f"Adjusted rank of {member.display_name} from {old_rank} to {new_rank}")
-
-        self.user_ranks = new_user_ranks
-        self.save_ranks_to_file()
-
-        # Update the rank list message in the designated channel
-        await self.update_rank_message(guild)
+        job = await self.commit_rank_fill(guild)
+        await self.propagate(guild, job)
 
+    @tracing.span('render rank list')
     async def update_rank_message(self, guild: discord.Guild):
         """
-        Creates or updates the rank list message in the specified channel, displaying all users with their ranks.
+        Creates or updates the rank list in the specified channel, displaying all users with their ranks.
+        The list is split into page messages; only pages whose text changed are edited.
         """
+        state = self.get_state(guild.id)
+        # Concurrent renders would each send the missing pages
+        async with state.render_lock:
+            await self._update_rank_pages(guild, state)
+
+    async def _get_rank_channel(self, guild: discord.Guild, state: GuildRankState) -> Optional[discord.TextChannel]:
+        """
+        Returns the rank channel from its cached id, looking it up by name or creating it
+        only when the cached id is unknown or stale.
+        """
+        channel = guild.get_channel(state.rank_channel_id) if state.rank_channel_id else None
+        if channel is not None:
+            return channel
+
         channel_name = config.RANK_CHANNEL_NAME
         channel = discord.utils.get(guild.text_channels, name=channel_name)
 
@@ -256,43 +585,99 @@ class RankManager:
                 logger.info(f"Created channel '{channel_name}' in guild '{guild.name}'")
             except Exception as e:
                 logger.exception(f"Failed to create channel '{channel_name}'")
-                return
+                return None
+
+        if channel.id != state.rank_channel_id:
+            state.rank_channel_id = channel.id
+            self.record(state, {'op': 'channel', 'rank_channel_id': channel.id})
+            # Nothing posted so far is known to be in this channel
+            state.forget_rendered()
+        return channel
 
+    async def _update_rank_pages(self, guild: discord.Guild, state: GuildRankState):
         # Generate the rank list content
-        if not self.user_ranks:
-            rank_list = "No ranks available."
+        if not state.user_ranks:
+            rank_lines = ["No ranks available."]
         else:
-            sorted_ranks = sorted(self.user_ranks.items(), key=lambda x: x[1])
+            entries = list(state.user_ranks.items())
+            with tracing.span('resolve members', count=len(entries)):
+                members = await self.resolver.resolve(guild, [int(user_id) for user_id, _ in entries])
             rank_lines = []
-            for user_id, rank in sorted_ranks:
-                try:
-                    member = guild.get_member(int(user_id)) or await guild.fetch_member(int(user_id))
+            for user_id, rank in entries:
+                member = members.get(int(user_id))
+                if member is not None:
                     nickname = member.nick if member.nick else member.name
                     rank_lines.append(f"Rank {rank}: {nickname}")
-                except discord.NotFound:
+                else:
                     rank_lines.append(f"Rank {rank}: User with ID {user_id} not found in guild")
-            rank_list = "\n".join(rank_lines)
-
-        # If a message ID is stored, try to fetch and edit the message
-        if self.rank_message_id:
+        pages = paginate(rank_lines)
+        digest = hashlib.sha256("\0".join(pages).encode()).hexdigest()
+        if digest == state.rendered_hash:
+            logger.debug(f"Rank list of guild '{guild.name}' is unchanged; skipping the update")
+            metrics.RENDERS.inc(outcome='unchanged')
+            return
+        metrics.RENDERS.inc(outcome='updated')
+
+        channel = await self._get_rank_channel(guild, state)
+        if channel is None:
+            return
+        channel_name = channel.name
+
+        if state.stale_message_ids:
+            stale, state.stale_message_ids = state.stale_message_ids, []
+            await self._delete_pages(channel, stale)
+
+        message_ids = list(state.rank_message_ids)
+        rendered = state.rendered_pages + [None] * (len(message_ids) - len(state.rendered_pages))
+        for index, content in enumerate(pages):
+            if index < len(message_ids):
+                if rendered[index] == content:
+                    continue
+                # Edit the existing page message without fetching it first
+                try:
+                    await channel.get_partial_message(message_ids[index]).edit(content=content)
+                    rendered[index] = content
+                    logger.info(f"Updated rank list page {index + 1} in channel '{channel_name}'")
+                    continue
+                except discord.NotFound:
+                    # A new message would land after the later pages, so those are reposted after it
+                    logger.info(f"Rank list page {index + 1} is missing; reposting it and the pages after it")
+                    await self._delete_pages(channel, message_ids[index + 1:])
+                    del message_ids[index:]
+                    del rendered[index:]
+                except Exception as e:
+                    logger.exception(f"Failed to update rank list page {index + 1}")
+                    rendered[index] = None
+                    continue
             try:
-                message = await channel.fetch_message(self.rank_message_id)
-                await message.edit(content=f"```\n{rank_list}\n```")
-                logger.info(f"Updated rank list message in channel '{channel_name}'")
-            except discord.NotFound:
-                # Message not found; send a new one
-                message = await channel.send(f"```\n{rank_list}\n```")
-                self.rank_message_id = message.id
-                self.save_ranks_to_file()
-                logger.info(f"Sent new rank list message in channel '{channel_name}'")
+                message = await channel.send(content)
             except Exception as e:
-                logger.exception("Failed to update rank list message")
-        else:
-            # No message ID stored; send a new message
+                logger.exception(f"Failed to send rank list page {index + 1}")
+                break
+            message_ids.append(message.id)
+            rendered.append(content)
+            logger.info(f"Sent new rank list page {index + 1} in channel '{channel_name}'")
+
+        # Delete pages left over from a longer list
+        await self._delete_pages(channel, message_ids[len(pages):])
+        del message_ids[len(pages):]
+        del rendered[len(message_ids):]
+
+        state.rendered_pages = rendered
+        # Only a list that was posted completely may be skipped next time
+        complete = len(message_ids) == len(pages) and rendered == pages
+        state.rendered_hash = digest if complete else None
+        if message_ids != state.rank_message_ids:
+            state.rank_message_ids = message_ids
+            self.record(state, {'op': 'messages', 'rank_message_ids': message_ids})
+
+    @staticmethod
+    async def _delete_pages(channel: discord.TextChannel, message_ids: List[int]):
+        """Deletes rank list pages that are no longer part of the list, ignoring those already gone."""
+        for message_id in message_ids:
             try:
-                message = await channel.send(f"```\n{rank_list}\n```")
-                self.rank_message_id = message.id
-                self.save_ranks_to_file()
-                logger.info(f"Sent new rank list message in channel '{channel_name}'")
+                await channel.get_partial_message(message_id).delete()
+            except discord.NotFound:
+                pass
             except Exception as e:
-                logger.exception("Failed to send rank list message")
+                logger.exception("Failed to delete a leftover rank list page")
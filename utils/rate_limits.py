@@ -0,0 +1,117 @@
+import logging
+import re
+import time
+from typing import Dict, Tuple
+
+import aiohttp
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+MEMBER_ROUTE = re.compile(r'/guilds/(\d+)/members/\d+$')
+
+
+def route_kind(path: str) -> str:
+    """Groups a Discord API path into a coarse route name for metrics."""
+    if '/messages' in path:
+        return 'message'
+    if '/members' in path:
+        return 'member'
+    if '/interactions/' in path or '/webhooks/' in path:
+        return 'interaction'
+    return 'other'
+
+
+class RateLimitTracker:
+    """
+    Records the rate-limit headers Discord returns for member edits, per guild.
+
+    It is hooked into discord.py's HTTP session through an aiohttp TraceConfig, so every
+    response is seen without wrapping the library's request code.
+    """
+
+    def __init__(self):
+        # guild id -> (remaining requests, monotonic time at which the bucket resets)
+        self.buckets: Dict[int, Tuple[int, float]] = {}
+        # Monotonic time of the last 429 on member edits per guild, and of the last global 429
+        self.rate_limited_at: Dict[int, float] = {}
+        # guild id -> monotonic time until which its member edit bucket was last seen exhausted
+        self.exhausted_until: Dict[int, float] = {}
+        self.global_rate_limited_at = 0.0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """Returns a TraceConfig to pass to the bot as `http_trace`."""
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_end.append(self._on_request_end)
+        return trace_config
+
+    async def _on_request_end(self, session, context, params: aiohttp.TraceRequestEndParams):
+        match = MEMBER_ROUTE.search(params.url.path) if params.method == 'PATCH' else None
+        if params.response.status == 429:
+            self._count_rate_limit('member_edit' if match else route_kind(params.url.path), params.response.headers)
+            headers = params.response.headers
+            if headers.get('X-RateLimit-Global') == 'true' or headers.get('X-RateLimit-Scope') == 'global':
+                self.global_rate_limited_at = time.monotonic()
+        if match is None:
+            return
+        self.observe(int(match.group(1)), params.response.status, params.response.headers)
+
+    @staticmethod
+    def _count_rate_limit(route: str, headers):
+        metrics.RATE_LIMITED.inc(route=route)
+        try:
+            metrics.RETRY_AFTER.inc(float(headers.get('Retry-After') or 0), route=route)
+        except ValueError:
+            pass
+
+    def observe(self, guild_id: int, status: int, headers):
+        """Updates the bucket of a guild from the headers of a member edit response."""
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset_after = headers.get('X-RateLimit-Reset-After') or headers.get('Retry-After')
+        if reset_after is None:
+            return
+        try:
+            reset_at = time.monotonic() + float(reset_after)
+            remaining = 0 if status == 429 else int(remaining if remaining is not None else 1)
+        except ValueError:
+            return
+        self.buckets[guild_id] = (remaining, reset_at)
+        if remaining <= 0:
+            self.exhausted_until[guild_id] = max(self.exhausted_until.get(guild_id, 0.0), reset_at)
+        if status == 429:
+            self.rate_limited_at[guild_id] = time.monotonic()
+            logger.warning(f"Rate limited on member edits in guild {guild_id} for {float(reset_after):.2f}s")
+
+    def delay_for(self, guild_id: int) -> float:
+        """Returns how long to wait before the next member edit in a guild, 0 if it can go now."""
+        bucket = self.buckets.get(guild_id)
+        if bucket is None:
+            return 0.0
+        remaining, reset_at = bucket
+        delay = reset_at - time.monotonic()
+        if delay <= 0:
+            del self.buckets[guild_id]
+            return 0.0
+        return delay if remaining <= 0 else 0.0
+
+    def rate_limited_since(self, guild_id: int, since: float) -> bool:
+        """Returns True if member edits in the guild got a 429 at or after the monotonic time `since`."""
+        return self.rate_limited_at.get(guild_id, 0.0) >= since
+
+    def bucket_contended_since(self, guild_id: int, since: float) -> bool:
+        """
+        Returns True if a member edit sent at the monotonic time `since` may have waited for
+        the guild's bucket: it got a 429 since, or the bucket was exhausted at or after that time.
+        """
+        return self.rate_limited_since(guild_id, since) or self.exhausted_until.get(guild_id, 0.0) > since
+
+    def globally_rate_limited_since(self, since: float) -> bool:
+        """Returns True if the bot hit the global rate limit at or after the monotonic time `since`."""
+        return self.global_rate_limited_at >= since
+
+    def consume(self, guild_id: int):
+        """Counts a request that is about to be sent against the guild's remaining budget."""
+        bucket = self.buckets.get(guild_id)
+        if bucket is not None:
+            self.buckets[guild_id] = (bucket[0] - 1, bucket[1])
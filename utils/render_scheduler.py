@@ -0,0 +1,58 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict
+
+import discord
+
+from utils import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class RenderScheduler:
+    """
+    Debounces rank list renders per guild.
+
+    Callers mark a guild's list dirty; the list is then rendered at most once per
+    `interval` seconds, always from the latest state at the time the render starts.
+    Changes made while a render runs cause one more render afterwards.
+    """
+
+    def __init__(self, render: Callable[[discord.Guild], Awaitable[None]], interval: float):
+        self.render = render
+        self.interval = interval
+        self.guilds: Dict[int, discord.Guild] = {}
+        self.last_render: Dict[int, float] = {}
+        self.tasks: Dict[int, asyncio.Task] = {}
+
+    def mark_dirty(self, guild: discord.Guild):
+        """Schedules a render of the guild's rank list if one is not already pending."""
+        self.guilds[guild.id] = guild
+        task = self.tasks.get(guild.id)
+        if task is None or task.done():
+            # Debounced renders are traced on their own, not as part of the command that triggered them
+            with tracing.detached():
+                self.tasks[guild.id] = asyncio.create_task(self._run(guild.id))
+
+    async def _run(self, guild_id: int):
+        try:
+            while guild_id in self.guilds:
+                wait = self.last_render.get(guild_id, 0.0) + self.interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                guild = self.guilds.pop(guild_id)
+                self.last_render[guild_id] = time.monotonic()
+                try:
+                    await self.render(guild)
+                except Exception:
+                    logger.exception(f"Failed to render the rank list of guild '{guild.name}'")
+        finally:
+            self.tasks.pop(guild_id, None)
+
+    def close(self):
+        """Cancels pending renders."""
+        for task in list(self.tasks.values()):
+            task.cancel()
+        self.tasks.clear()
+        self.guilds.clear()
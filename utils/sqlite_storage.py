@@ -0,0 +1,271 @@
+import json
+import logging
+import os
+import sqlite3
+from typing import Dict, List, Optional, Set, Tuple
+
+from utils.guild_state import GuildRankState
+from utils.rank_index import RankIndex
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ranks (
+    guild_id INTEGER NOT NULL,
+    member_id INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, member_id)
+);
+CREATE INDEX IF NOT EXISTS ranks_by_rank ON ranks (guild_id, rank);
+CREATE TABLE IF NOT EXISTS guilds (
+    guild_id INTEGER PRIMARY KEY,
+    rank_message_id INTEGER,
+    rank_message_ids TEXT,
+    rank_channel_id INTEGER,
+    audit_cursor INTEGER,
+    fingerprint TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class SqliteRankStorage:
+    """
+    Stores ranks in a SQLite database in WAL mode.
+
+    Operations are queued on the event loop and applied in one transaction per save from a
+    worker thread. Rank shifts run as a single range UPDATE on the (guild_id, rank) index.
+    """
+
+    def __init__(self, path: str, migrate_from=None):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Only one save runs at a time, so the connection is never used concurrently
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        # Columns added after the first release of the schema
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(guilds)")}
+        for column, column_type in (
+            ('rank_message_ids', 'TEXT'),
+            ('rank_channel_id', 'INTEGER'),
+            ('audit_cursor', 'INTEGER'),
+            ('fingerprint', 'TEXT'),
+        ):
+            if column not in columns:
+                self.connection.execute(f"ALTER TABLE guilds ADD COLUMN {column} {column_type}")
+        self.connection.commit()
+        self.migrate_from = migrate_from
+        self.pending: List[dict] = []
+        self.snapshot_guilds: Set[int] = set()
+        self.resync = False
+
+    def load(self) -> Tuple[Dict[int, GuildRankState], Optional[dict]]:
+        """
+        Loads every guild's ranks and rank list message IDs, importing the JSON storage on first use.
+        Also returns the content of a legacy single-ladder 'ranks.json' that still has to be seeded.
+        """
+        legacy_section = None
+        if self.migrate_from is not None and not self._migrated():
+            legacy_section = self.import_json(self.migrate_from)
+
+        ranks: Dict[int, Dict[str, int]] = {}
+        for guild_id, member_id, rank in self.connection.execute("SELECT guild_id, member_id, rank FROM ranks"):
+            ranks.setdefault(guild_id, {})[str(member_id)] = rank
+        message_ids = {}
+        channel_ids = {}
+        audit_cursors = {}
+        fingerprints = {}
+        for guild_id, rank_message_id, rank_message_ids, rank_channel_id, audit_cursor, fingerprint in self.connection.execute(
+            "SELECT guild_id, rank_message_id, rank_message_ids, rank_channel_id, audit_cursor, fingerprint FROM guilds"
+        ):
+            channel_ids[guild_id] = rank_channel_id
+            audit_cursors[guild_id] = audit_cursor or 0
+            fingerprints[guild_id] = fingerprint
+            if rank_message_ids is not None:
+                message_ids[guild_id] = json.loads(rank_message_ids)
+            else:
+                message_ids[guild_id] = [rank_message_id] if rank_message_id else []
+
+        guilds = {}
+        for guild_id in set(ranks) | set(message_ids):
+            guilds[guild_id] = GuildRankState(
+                guild_id,
+                RankIndex(ranks.get(guild_id, {})),
+                message_ids.get(guild_id),
+                channel_ids.get(guild_id),
+                audit_cursors.get(guild_id, 0),
+                fingerprints.get(guild_id),
+            )
+        logger.info(f"Loaded ranks of {len(guilds)} guilds from '{os.path.basename(self.path)}'")
+        return guilds, legacy_section
+
+    def _migrated(self) -> bool:
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone()
+        return row is not None
+
+    def import_json(self, source) -> Optional[dict]:
+        """
+        Imports the snapshot and journal of a JSON storage into the database.
+        Returns the legacy single-ladder section if the JSON file still uses that layout.
+        """
+        guilds, legacy_section = source.load()
+        with self.connection:
+            for state in guilds.values():
+                self._write_guild(
+                    state.guild_id,
+                    state.user_ranks.to_dict(),
+                    state.rank_message_ids,
+                    state.rank_channel_id,
+                    state.audit_cursor,
+                    state.fingerprint,
+                )
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', '1')")
+        if guilds:
+            logger.info(f"Imported ranks of {len(guilds)} guilds from 'ranks.json' into '{os.path.basename(self.path)}'")
+        return legacy_section
+
+    def record(self, record: dict):
+        """Queues an operation that was just applied in memory."""
+        self.pending.append(record)
+
+    def request_snapshot(self, guild_id: int):
+        """Makes the next save rewrite all rows of a guild, e.g. after a bulk change."""
+        self.snapshot_guilds.add(guild_id)
+
+    def prepare_save(self, guilds: Dict[int, GuildRankState]) -> tuple:
+        """Takes the queued operations and copies of the guilds that have to be rewritten in full."""
+        records, self.pending = self.pending, []
+        if self.resync:
+            self.resync = False
+            guild_ids = set(guilds)
+        else:
+            guild_ids, self.snapshot_guilds = self.snapshot_guilds, set()
+        snapshots = [
+            (
+                guild_id,
+                guilds[guild_id].user_ranks.to_dict(),
+                list(guilds[guild_id].rank_message_ids),
+                guilds[guild_id].rank_channel_id,
+                guilds[guild_id].audit_cursor,
+                guilds[guild_id].fingerprint,
+            )
+            for guild_id in guild_ids if guild_id in guilds
+        ]
+        return records, snapshots
+
+    def write_save(self, payload: tuple):
+        """Applies a payload from prepare_save in one transaction. Runs in a worker thread."""
+        records, snapshots = payload
+        try:
+            with self.connection:
+                for record in records:
+                    self._apply(record)
+                for snapshot in snapshots:
+                    self._write_guild(*snapshot)
+        except Exception:
+            # The transaction was rolled back and the queued operations are gone; rewrite everything
+            self.resync = True
+            raise
+        logger.debug(f"Saved {len(records)} rank operations and {len(snapshots)} guild snapshots to the database")
+
+    def _apply(self, record: dict):
+        guild_id = int(record['guild'])
+        op = record['op']
+        execute = self.connection.execute
+        if op == 'set':
+            member_id, new_rank = int(record['member']), record['rank']
+            row = execute("SELECT rank FROM ranks WHERE guild_id = ? AND member_id = ?", (guild_id, member_id)).fetchone()
+            if row is None:
+                execute("UPDATE ranks SET rank = rank + 1 WHERE guild_id = ? AND rank >= ?", (guild_id, new_rank))
+                execute("INSERT INTO ranks (guild_id, member_id, rank) VALUES (?, ?, ?)", (guild_id, member_id, new_rank))
+                return
+            old_rank = row[0]
+            if new_rank < old_rank:
+                execute(
+                    "UPDATE ranks SET rank = rank + 1 WHERE guild_id = ? AND rank BETWEEN ? AND ?",
+                    (guild_id, new_rank, old_rank - 1)
+                )
+            elif new_rank > old_rank:
+                execute(
+                    "UPDATE ranks SET rank = rank - 1 WHERE guild_id = ? AND rank BETWEEN ? AND ?",
+                    (guild_id, old_rank + 1, new_rank)
+                )
+            execute("UPDATE ranks SET rank = ? WHERE guild_id = ? AND member_id = ?", (new_rank, guild_id, member_id))
+        elif op == 'remove':
+            member_id = int(record['member'])
+            row = execute("SELECT rank FROM ranks WHERE guild_id = ? AND member_id = ?", (guild_id, member_id)).fetchone()
+            if row is None:
+                return
+            execute("DELETE FROM ranks WHERE guild_id = ? AND member_id = ?", (guild_id, member_id))
+            execute("UPDATE ranks SET rank = rank - 1 WHERE guild_id = ? AND rank > ?", (guild_id, row[0]))
+        elif op == 'fill':
+            self.connection.executemany(
+                "UPDATE ranks SET rank = ? WHERE guild_id = ? AND member_id = ?",
+                [(rank, guild_id, int(member_id)) for member_id, rank in record['ranks'].items()]
+            )
+        elif op == 'messages':
+            self._write_message_ids(guild_id, record['rank_message_ids'])
+        elif op == 'channel':
+            self._write_channel_id(guild_id, record['rank_channel_id'])
+        elif op == 'audit':
+            self._write_audit_cursor(guild_id, record['audit_cursor'])
+        elif op == 'fingerprint':
+            self._write_fingerprint(guild_id, record['fingerprint'])
+        else:
+            logger.warning(f"Skipping unknown rank operation '{op}'")
+
+    def _write_guild(
+        self,
+        guild_id: int,
+        user_ranks: Dict[str, int],
+        rank_message_ids: List[int],
+        rank_channel_id: Optional[int],
+        audit_cursor: int,
+        fingerprint: Optional[str],
+    ):
+        """Replaces all rows of a guild."""
+        self.connection.execute("DELETE FROM ranks WHERE guild_id = ?", (guild_id,))
+        self.connection.executemany(
+            "INSERT INTO ranks (guild_id, member_id, rank) VALUES (?, ?, ?)",
+            [(guild_id, int(member_id), rank) for member_id, rank in user_ranks.items()]
+        )
+        self._write_message_ids(guild_id, rank_message_ids)
+        self._write_channel_id(guild_id, rank_channel_id)
+        self._write_audit_cursor(guild_id, audit_cursor)
+        self._write_fingerprint(guild_id, fingerprint)
+
+    def _write_message_ids(self, guild_id: int, rank_message_ids: List[int]):
+        self.connection.execute(
+            "INSERT INTO guilds (guild_id, rank_message_ids) VALUES (?, ?) "
+            "ON CONFLICT (guild_id) DO UPDATE SET rank_message_ids = excluded.rank_message_ids",
+            (guild_id, json.dumps(rank_message_ids))
+        )
+
+    def _write_channel_id(self, guild_id: int, rank_channel_id: Optional[int]):
+        self.connection.execute(
+            "INSERT INTO guilds (guild_id, rank_channel_id) VALUES (?, ?) "
+            "ON CONFLICT (guild_id) DO UPDATE SET rank_channel_id = excluded.rank_channel_id",
+            (guild_id, rank_channel_id)
+        )
+
+    def _write_audit_cursor(self, guild_id: int, audit_cursor: int):
+        self.connection.execute(
+            "INSERT INTO guilds (guild_id, audit_cursor) VALUES (?, ?) "
+            "ON CONFLICT (guild_id) DO UPDATE SET audit_cursor = excluded.audit_cursor",
+            (guild_id, audit_cursor)
+        )
+
+    def _write_fingerprint(self, guild_id: int, fingerprint: Optional[str]):
+        self.connection.execute(
+            "INSERT INTO guilds (guild_id, fingerprint) VALUES (?, ?) "
+            "ON CONFLICT (guild_id) DO UPDATE SET fingerprint = excluded.fingerprint",
+            (guild_id, fingerprint)
+        )
+
+    def close(self):
+        self.connection.close()
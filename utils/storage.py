@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import config
+from utils.guild_state import GuildRankState
+from utils.journal import RankJournal
+from utils.persistence import atomic_write
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '../data')
+
+
+class JsonRankStorage:
+    """
+    Stores ranks as a 'ranks.json' snapshot plus an append-only journal of the operations
+    applied since that snapshot.
+    """
+
+    def __init__(self, data_file: str, journal_file: str, compact_threshold: int):
+        self.DATA_FILE = data_file
+        self.journal = RankJournal(journal_file, compact_threshold)
+
+    def load(self) -> Tuple[Dict[int, GuildRankState], Optional[dict]]:
+        """
+        Load each guild's user ranks and rank message ID from the 'ranks.json' snapshot if it exists,
+        then replay the operations journaled after it. Also returns the content of a 'ranks.json'
+        in the old single-ladder layout, if that is what was found.
+        """
+        guilds: Dict[int, GuildRankState] = {}
+        legacy_section = None
+        snapshot_seq = 0
+        if os.path.exists(self.DATA_FILE):
+            try:
+                with open(self.DATA_FILE, 'r') as f:
+                    data = json.load(f)
+                    if 'guilds' in data:
+                        for guild_id, section in data['guilds'].items():
+                            guilds[int(guild_id)] = GuildRankState.from_section(int(guild_id), section)
+                        snapshot_seq = data.get('journal_seq', 0)
+                    elif 'user_ranks' in data:
+                        legacy_section = data
+                    logger.info("Loaded ranks and rank message IDs from 'ranks.json'")
+            except Exception as e:
+                logger.exception("Failed to load ranks from 'ranks.json'")
+        else:
+            logger.info("'ranks.json' not found. Starting with empty ranks.")
+
+        self.journal.seq = snapshot_seq
+        try:
+            replayed = 0
+            for record in self.journal.read(snapshot_seq):
+                guild_id = int(record['guild'])
+                state = guilds.get(guild_id)
+                if state is None:
+                    state = guilds[guild_id] = GuildRankState(guild_id)
+                if not state.apply(record):
+                    logger.warning(f"Skipping unknown rank journal operation '{record['op']}'")
+                self.journal.seq = record['seq']
+                replayed += 1
+            self.journal.records_since_snapshot = replayed
+            if replayed:
+                logger.info(f"Replayed {replayed} operations from the rank journal")
+        except Exception as e:
+            logger.exception("Failed to replay the rank journal")
+        return guilds, legacy_section
+
+    def record(self, record: dict):
+        """Queues a journal record for an operation that was just applied in memory."""
+        self.journal.append(record)
+
+    def request_snapshot(self, guild_id: int):
+        """Makes the next save write a full snapshot, e.g. after a bulk change that is not journaled."""
+        self.journal.request_compaction()
+
+    def prepare_save(self, guilds: Dict[int, GuildRankState]) -> tuple:
+        """
+        Takes what the next save has to write: the journal records queued since the last save,
+        or a copy of every guild's section once the journal is due for compaction.
+        """
+        records = self.journal.drain()
+        if self.journal.needs_compaction():
+            self.journal.compacted()
+            return 'snapshot', [(state, *state.snapshot_section()) for state in guilds.values()], self.journal.seq
+        return 'append', records
+
+    def write_save(self, payload: tuple) -> int:
+        """Writes a payload from prepare_save and returns the bytes written. Runs in a worker thread."""
+        try:
+            if payload[0] == 'snapshot':
+                _, sections, seq = payload
+                written = self.save_ranks_to_file(sections, seq)
+                self.journal.truncate()
+                return written
+            return self.journal.write_records(payload[1])
+        except Exception:
+            # The drained records are gone, so recover with a full snapshot on the next save
+            self.journal.request_compaction()
+            raise
+
+    def save_ranks_to_file(self, sections: List[tuple], seq: int) -> int:
+        """
+        Save a snapshot of each guild's user ranks and rank message ID to 'ranks.json' file,
+        including every journal record up to `seq`. The file is replaced atomically.
+        """
+        parts = []
+        for state, version, section in sections:
+            if not isinstance(section, str):
+                section = json.dumps(section)
+                state.cache_section(version, section)
+            parts.append(f"{json.dumps(str(state.guild_id))}: {section}")
+        written = atomic_write(self.DATA_FILE, f'{{"journal_seq": {seq}, "guilds": {{{", ".join(parts)}}}}}')
+        logger.info("Saved ranks and rank message IDs to 'ranks.json'")
+        return written
+
+    def close(self):
+        pass
+
+
+def create_storage():
+    """Creates the storage backend selected by `config.RANK_STORAGE`."""
+    json_storage = JsonRankStorage(
+        os.path.join(DATA_DIR, 'ranks.json'),
+        os.path.join(DATA_DIR, 'ranks.journal'),
+        config.RANK_JOURNAL_COMPACT_THRESHOLD,
+    )
+    if config.RANK_STORAGE == 'sqlite':
+        from utils.sqlite_storage import SqliteRankStorage
+        return SqliteRankStorage(config.RANK_DATABASE or os.path.join(DATA_DIR, 'ranks.db'), migrate_from=json_storage)
+    if config.RANK_STORAGE != 'json':
+        logger.warning(f"Unknown RANK_STORAGE '{config.RANK_STORAGE}', using 'json'")
+    return json_storage
@@ -0,0 +1,182 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """A timed operation with nested child spans."""
+
+    __slots__ = ('name', 'attributes', 'parent', 'children', 'start', 'end')
+
+    def __init__(self, name: str, attributes: Dict[str, Any], parent: Optional['Span']):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.children: List['Span'] = []
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self, origin: Optional[float] = None) -> dict:
+        """Returns the span tree with times in milliseconds relative to the root."""
+        origin = self.start if origin is None else origin
+        return {
+            'name': self.name,
+            'start_ms': round((self.start - origin) * 1000, 3),
+            'duration_ms': round(self.duration * 1000, 3),
+            'attributes': self.attributes,
+            'children': [child.to_dict(origin) for child in self.children],
+        }
+
+    def to_chrome_events(self, origin: Optional[float] = None) -> List[dict]:
+        """Returns the span tree as Chrome trace-event 'complete' events."""
+        origin = self.start if origin is None else origin
+        events = [{
+            'name': self.name,
+            'ph': 'X',
+            'ts': round((self.start - origin) * 1_000_000),
+            'dur': round(self.duration * 1_000_000),
+            'pid': 1,
+            'tid': 1,
+            'args': {key: str(value) for key, value in self.attributes.items()},
+        }]
+        for child in self.children:
+            events.extend(child.to_chrome_events(origin))
+        return events
+
+
+class Tracer:
+    """
+    Records spans and exports root spans that took at least `slow_threshold` seconds
+    to `directory`, as nested JSON or in the Chrome trace-event format.
+    A threshold of 0 disables the export.
+    """
+
+    def __init__(self, slow_threshold: float = 0.0, directory: Optional[str] = None, chrome_format: bool = False):
+        self.slow_threshold = slow_threshold
+        self.directory = directory
+        self.chrome_format = chrome_format
+
+    def finish(self, span: Span):
+        if span.parent is not None or not self.slow_threshold or not self.directory:
+            return
+        if span.duration < self.slow_threshold:
+            return
+        logger.info(f"Slow operation '{span.name}' took {span.duration:.2f}s, exporting its trace")
+        if self.chrome_format:
+            document = {'traceEvents': span.to_chrome_events(), 'displayTimeUnit': 'ms'}
+        else:
+            document = span.to_dict()
+        path = os.path.join(self.directory, f"trace-{time.strftime('%Y%m%d-%H%M%S')}-{span.name.replace(' ', '_')}-{id(span):x}.json")
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(path, document)
+        else:
+            loop.run_in_executor(None, self._write, path, document)
+
+    @staticmethod
+    def _write(path: str, document: dict):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(document, f)
+        except OSError:
+            logger.exception(f"Failed to write trace '{path}'")
+
+
+tracer = Tracer()
+
+
+def configure(slow_threshold: float, directory: Optional[str], chrome_format: bool = False):
+    """Sets up the export of slow traces."""
+    tracer.slow_threshold = slow_threshold
+    tracer.directory = directory
+    tracer.chrome_format = chrome_format
+
+
+class span:
+    """
+    Records a span around a block or a function call, nested under the current span.
+
+        with span('shift', guild=guild.id):
+            ...
+
+        @span('render')
+        async def update_rank_message(...):
+            ...
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self._spans: List[Span] = []
+        self._tokens: List[contextvars.Token] = []
+
+    def __enter__(self) -> Span:
+        current = Span(self.name, dict(self.attributes), _current.get())
+        if current.parent is not None:
+            current.parent.children.append(current)
+        self._spans.append(current)
+        self._tokens.append(_current.set(current))
+        return current
+
+    def __exit__(self, exc_type, exc, tb):
+        current = self._spans.pop()
+        _current.reset(self._tokens.pop())
+        current.end = time.perf_counter()
+        if exc_type is not None:
+            current.attributes['error'] = exc_type.__name__
+        tracer.finish(current)
+        return False
+
+    async def __aenter__(self) -> Span:
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+    def __call__(self, function):
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with span(self.name, **self.attributes):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(self.name, **self.attributes):
+                return function(*args, **kwargs)
+        return wrapper
+
+
+def current_span() -> Optional[Span]:
+    """Returns the innermost span of the running task, if any."""
+    return _current.get()
+
+
+@contextmanager
+def detached():
+    """
+    Starts no span, but hides the current one, so tasks created in the block begin their own
+    traces instead of attaching to an operation that may have finished long before they run.
+    """
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)